@@ -0,0 +1,126 @@
+"""
+Compares FAISS vector compression options: memory per vector and recall@k
+against exact float32 search.
+
+Each option is built with the same code as ProductIndexer (see
+src/data_pipeline/vector_compression.py). Lossy options are also measured
+with exact re-ranking of a refine_factor * k shortlist. Recall@k is the
+fraction of the exact k nearest neighbours an option returns in its top k.
+
+The demo catalog is far too small to train PQ or PCA, so by default the
+benchmark runs on synthetic clustered vectors of the embedding dimension.
+Use --catalog to measure the real product embeddings and eval queries
+(options that cannot be trained on them are reported as skipped).
+
+Usage (from the project root):
+    python -m benchmarks.compression_benchmark --synthetic 100000 --queries 1000 --top-k 10
+    python -m benchmarks.compression_benchmark --catalog --top-k 2
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from src.data_pipeline.vector_compression import build_index, recall_at_k, refine_search
+
+# (label, compression, pca_dim, pq_m); pq_m None uses --pq-m
+OPTIONS = [
+    ("float32", "none", 0, None),
+    ("fp16", "fp16", 0, None),
+    ("int8", "int8", 0, None),
+    ("pq", "pq", 0, None),
+    ("pca", "none", 128, None),
+    ("pca+int8", "int8", 128, None),
+    ("pca+pq", "pq", 128, 32),
+]
+
+
+def synthetic_vectors(n: int, n_queries: int, dimension: int, clusters: int, latent_dim: int, seed: int):
+    """
+    Clustered vectors that vary mostly within a low-dimensional subspace, like
+    sentence embeddings of a product catalog, plus a little isotropic noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    basis = rng.normal(size=(latent_dim, dimension)) / np.sqrt(latent_dim)
+    def sample(count):
+        points = (centers[rng.integers(clusters, size=count)]
+                  + rng.normal(size=(count, latent_dim)) @ basis
+                  + 0.05 * rng.normal(size=(count, dimension)))
+        return points.astype('float32')
+    return sample(n), sample(n_queries)
+
+
+def catalog_vectors(queries_path: str):
+    """Product embeddings (from the embedding store) and encoded eval queries."""
+    from src.data_pipeline.indexer import ProductIndexer
+    indexer = ProductIndexer()
+    indexer._load_products()
+    embeddings = indexer._create_embeddings()
+    with open(queries_path, 'r', encoding='utf-8') as f:
+        queries = [q["query"] for q in json.load(f)]
+    return np.asarray(embeddings, dtype='float32'), np.asarray(indexer.model.encode(queries), dtype='float32')
+
+
+def evaluate(index, vectors, queries, exact_ids, top_k: int, refine_factor: int) -> dict:
+    start = time.perf_counter()
+    if refine_factor:
+        found = np.vstack([refine_search(index, vectors, q.reshape(1, -1), top_k, refine_factor)[1] for q in queries])
+    else:
+        _, found = index.search(queries, top_k)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {"recall": recall_at_k(found, exact_ids, top_k), "ms_per_query": elapsed_ms / len(queries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=50000, help="Number of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500, help="Number of synthetic queries")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--latent-dim", type=int, default=48, help="Intrinsic dimension of synthetic vectors")
+    parser.add_argument("--catalog", action="store_true", help="Use the product catalog instead of synthetic data")
+    parser.add_argument("--eval-queries", default="data/eval_queries.json")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--refine-factor", type=int, default=4)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.catalog:
+        vectors, queries = catalog_vectors(args.eval_queries)
+    else:
+        vectors, queries = synthetic_vectors(args.synthetic, args.queries, args.dimension, args.clusters,
+                                             args.latent_dim, args.seed)
+    top_k = min(args.top_k, len(vectors))
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, exact_ids = exact.search(queries, top_k)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{top_k}, "
+          f"refine shortlist = {args.refine_factor} x k")
+    print(f"{'option':<10} {'index':<18} {'bytes/vec':>9} {'ratio':>6} {'recall':>7} {'ms/q':>6} "
+          f"{'recall+refine':>13} {'ms/q':>6}")
+    for label, compression, pca_dim, pq_m in OPTIONS:
+        try:
+            index, metadata = build_index(vectors, compression=compression, pca_dim=pca_dim,
+                                          pq_m=pq_m or args.pq_m, pq_nbits=args.pq_nbits, seed=args.seed)
+        except ValueError as e:
+            print(f"{label:<10} skipped: {e}")
+            continue
+        size = metadata["bytes_per_vector"]
+        plain = evaluate(index, vectors, queries, exact_ids, top_k, refine_factor=0)
+        line = (f"{label:<10} {metadata['factory']:<18} {size:>9} {4 * vectors.shape[1] / size:>5.1f}x "
+                f"{plain['recall']:>7.3f} {plain['ms_per_query']:>6.2f}")
+        if metadata["factory"] != "Flat":
+            refined = evaluate(index, vectors, queries, exact_ids, top_k, args.refine_factor)
+            line += f" {refined['recall']:>13.3f} {refined['ms_per_query']:>6.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures the tail-latency effect of hedged LLM calls against a simulated upstream.
+
+The upstream sleeps for a heavy-tailed (lognormal) time, like a real LLM API
+with occasional stragglers. The same call mix is run through ResilientCaller
+with hedging off and on, and p50/p95/p99 plus the extra load from hedges are
+reported.
+
+For an end-to-end measurement through /query, run the loadtest harness
+(loadtest/fake_gemini.py + loadtest/driver.py) once with LLM_HEDGE_ENABLED=0
+and once with LLM_HEDGE_ENABLED=1.
+
+Usage (from the project root):
+    python -m benchmarks.hedging_benchmark --calls 1000 --median-ms 40 --sigma 0.8
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.services.llm_resilience import CircuitBreaker, ResilientCaller
+
+
+def run(label: str, caller: ResilientCaller, calls: int, concurrency: int, median_s: float, sigma: float) -> dict:
+    def upstream():
+        time.sleep(random.lognormvariate(0, sigma) * median_s)
+        return "ok"
+
+    def one_call(_):
+        start = time.perf_counter()
+        caller.call(upstream)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_call, range(calls)))
+    return {
+        "mode": label,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "extra_load": caller.stats["hedges"] / calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=40)
+    parser.add_argument("--sigma", type=float, default=0.8)
+    parser.add_argument("--hedge-percentile", type=float, default=95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for hedge_enabled in (False, True):
+        random.seed(args.seed)
+        caller = ResilientCaller(hedge_enabled=hedge_enabled, hedge_percentile=args.hedge_percentile,
+                                 hedge_min_delay_s=args.median_ms / 1000.0, max_retries=0,
+                                 breaker=CircuitBreaker(failure_threshold=10**9, reset_timeout_s=1))
+        rows.append(run("hedged" if hedge_enabled else "no hedging", caller, args.calls,
+                        args.concurrency, args.median_ms / 1000.0, args.sigma))
+
+    print(f"{args.calls} calls, concurrency={args.concurrency}, upstream lognormal(median={args.median_ms} ms, "
+          f"sigma={args.sigma}), hedge at p{args.hedge_percentile:g}")
+    for row in rows:
+        print(f"{row['mode']:<12} p50={row['p50_ms']:.1f} ms  p95={row['p95_ms']:.1f} ms  "
+              f"p99={row['p99_ms']:.1f} ms  extra load={row['extra_load']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compares first-stage FAISS retrieval with FAISS + cross-encoder reranking.
+
+Reports precision@k against the labeled queries in data/eval_queries.json,
+plus p50/p95 latency per request. Reranking is measured both cold (score
+cache cleared before every request) and warm (cache populated).
+
+Usage (from the project root):
+    python -m benchmarks.rerank_benchmark --top-k 2 --candidates 20 --repeats 5
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.config import settings
+from src.data_pipeline.reranker import CrossEncoderReranker, RerankingRetriever
+from src.data_pipeline.retriever import product_retriever
+
+
+def load_labeled_queries(path: str) -> list[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        queries = json.load(f)
+    # Queries without a relevant product cannot contribute to precision
+    return [q for q in queries if q["relevant_ids"]]
+
+
+def precision_at_k(results, relevant_ids, top_k: int) -> float:
+    hits = sum(1 for doc in results[:top_k] if doc["id"] in relevant_ids)
+    return hits / top_k
+
+
+def run(label: str, retrieve, queries: list[dict], top_k: int, repeats: int, before_each=None) -> dict:
+    latencies = []
+    precisions = []
+    for _ in range(repeats):
+        for q in queries:
+            if before_each:
+                before_each()
+            start = time.perf_counter()
+            results = retrieve(q["query"])
+            latencies.append((time.perf_counter() - start) * 1000)
+            precisions.append(precision_at_k(results, set(q["relevant_ids"]), top_k))
+    return {
+        "mode": label,
+        f"precision@{top_k}": float(np.mean(precisions)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default="data/eval_queries.json")
+    parser.add_argument("--top-k", type=int, default=settings.TOP_K_DOCS)
+    parser.add_argument("--candidates", type=int, default=settings.RERANK_CANDIDATES)
+    parser.add_argument("--budget-ms", type=float, default=settings.RERANK_BUDGET_MS)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = load_labeled_queries(args.queries)
+    reranker = CrossEncoderReranker()
+    two_stage = RerankingRetriever(product_retriever, reranker=reranker, candidates=args.candidates)
+
+    # Warm up both models so load time is not counted
+    two_stage.get_relevant_context(queries[0]["query"], top_k=args.top_k, budget_ms=float("inf"))
+    reranker.clear_cache()
+
+    rows = [
+        run("faiss", lambda q: product_retriever.get_relevant_context(q, top_k=args.top_k),
+            queries, args.top_k, args.repeats),
+        run("faiss+rerank (cold)", lambda q: two_stage.get_relevant_context(q, top_k=args.top_k, budget_ms=args.budget_ms),
+            queries, args.top_k, args.repeats, before_each=reranker.clear_cache),
+        run("faiss+rerank (warm)", lambda q: two_stage.get_relevant_context(q, top_k=args.top_k, budget_ms=args.budget_ms),
+            queries, args.top_k, args.repeats),
+    ]
+
+    print(f"{len(queries)} labeled queries x {args.repeats} repeats, top_k={args.top_k}, "
+          f"candidates={args.candidates}, budget={args.budget_ms:.0f} ms")
+    for row in rows:
+        print("  ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value:<20}"
+                        for key, value in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Open-loop load driver for the /query endpoint.
+
+Replays a weighted query mix at fixed arrival rates and reports throughput,
+p50/p95/p99 latency and error rates per rate. Requests are issued on schedule
+regardless of how many are still in flight, and latency is measured from the
+scheduled send time, so a slow server cannot hide queueing delay from the
+results (no coordinated omission).
+
+Usage:
+    python -m loadtest.driver --url http://localhost:5000 --rates 1,2,4 --duration 60
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+
+from loadtest.fake_gemini import FAKE_SERVICE_NAME
+
+
+def load_query_mix(path: str) -> tuple[list[str], list[float]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        mix = json.load(f)
+    return [item["query"] for item in mix], [float(item.get("weight", 1)) for item in mix]
+
+
+def _send(session: requests.Session, url: str, payload: dict, scheduled: float, timeout: float) -> dict:
+    try:
+        response = session.post(url, json=payload, timeout=timeout)
+        body = response.json() if response.headers.get("Content-Type", "").startswith("application/json") else {}
+        outcome = {"status": response.status_code, "tier": body.get("tier")}
+    except requests.RequestException as e:
+        outcome = {"status": type(e).__name__, "tier": None}
+    outcome["latency_ms"] = (time.perf_counter() - scheduled) * 1000
+    return outcome
+
+
+def run_rate(url: str, queries: list[str], weights: list[float], rate: float, duration: float,
+             timeout: float, max_in_flight: int, poisson: bool, seed: int) -> dict:
+    """Drives one arrival rate for `duration` seconds and summarizes the outcomes."""
+    rng = random.Random(seed)
+    local = threading.local()
+
+    def send(payload, scheduled):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return _send(local.session, url, payload, scheduled, timeout)
+
+    futures = []
+    start = time.perf_counter()
+    next_send = start
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        i = 0
+        while next_send - start < duration:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            query = rng.choices(queries, weights=weights)[0]
+            payload = {"user_id": f"loadtest-{i % 100}", "query": query}
+            futures.append(pool.submit(send, payload, next_send))
+            i += 1
+            next_send += rng.expovariate(rate) if poisson else 1.0 / rate
+        outcomes = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+
+    ok = [o for o in outcomes if o["status"] == 200]
+    latencies = [o["latency_ms"] for o in ok]
+    statuses = Counter(str(o["status"]) for o in outcomes)
+    tiers = Counter(o["tier"] for o in ok)
+    percentile = lambda q: float(np.percentile(latencies, q)) if latencies else None
+    return {
+        "target_rps": rate,
+        "sent": len(outcomes),
+        "throughput_rps": len(ok) / elapsed,
+        "error_rate": 1 - len(ok) / len(outcomes) if outcomes else 0.0,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "statuses": dict(statuses),
+        "tiers": dict(tiers),
+    }
+
+
+def wait_for_health(base_url: str, timeout: float):
+    """Polls /health until the app answers, e.g. while the container is still indexing."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if requests.get(base_url + "/health", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"{base_url} did not become healthy within {timeout:.0f}s")
+        time.sleep(2)
+
+
+def require_fake_llm(base_url: str):
+    """
+    Refuses to run unless the app sends its LLM calls to the fake Gemini server:
+    the load test must never hit (and pay for) the real API.
+    """
+    api_base = requests.get(base_url + "/health", timeout=5).json().get("llm_api_base")
+    if not api_base:
+        raise SystemExit(f"{base_url} calls the real Gemini API (GEMINI_API_BASE is unset). Point it at "
+                         "loadtest.fake_gemini, or pass --allow-real-llm.")
+    parts = urlsplit(api_base)
+    try:
+        service = requests.get(f"{parts.scheme}://{parts.netloc}/health", timeout=5).json().get("service")
+    except (requests.RequestException, ValueError):
+        service = None
+    if service != FAKE_SERVICE_NAME:
+        raise SystemExit(f"{base_url} calls {api_base}, which is not the fake Gemini server. "
+                         "Pass --allow-real-llm to run anyway.")
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000", help="Base URL of the app")
+    parser.add_argument("--mix", default="loadtest/query_mix.json", help="Weighted query mix (JSON)")
+    parser.add_argument("--rates", default="1,2,4", help="Comma-separated arrival rates (requests/s)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds per rate")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request (s)")
+    parser.add_argument("--max-in-flight", type=int, default=512)
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of fixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    parser.add_argument("--wait", type=float, default=0, help="Seconds to wait for /health before starting")
+    parser.add_argument("--allow-real-llm", action="store_true",
+                        help="Run even if the app is not using the fake Gemini server")
+    args = parser.parse_args()
+
+    queries, weights = load_query_mix(args.mix)
+    base_url = args.url.rstrip("/")
+    if args.wait:
+        wait_for_health(base_url, args.wait)
+    if not args.allow_real_llm:
+        require_fake_llm(base_url)
+    endpoint = base_url + "/query"
+    results = []
+    print(f"{'rate':>6} {'sent':>6} {'rps':>7} {'err%':>6} {'p50':>7} {'p95':>7} {'p99':>7}  statuses / tiers")
+    for rate in (float(r) for r in args.rates.split(",")):
+        result = run_rate(endpoint, queries, weights, rate, args.duration, args.timeout,
+                          args.max_in_flight, args.poisson, args.seed)
+        results.append(result)
+        print(f"{rate:>6.1f} {result['sent']:>6} {result['throughput_rps']:>7.2f} {result['error_rate'] * 100:>6.1f} "
+              f"{_fmt(result['p50_ms']):>7} {_fmt(result['p95_ms']):>7} {_fmt(result['p99_ms']):>7}  "
+              f"{result['statuses']} {result['tiers']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
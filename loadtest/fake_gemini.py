@@ -0,0 +1,230 @@
+"""
+Local stand-in for the Gemini generateContent API, for offline load tests.
+
+It answers the requests the crew's LLM client sends to
+  POST .../models/<model>:generateContent
+  POST .../models/<model>:streamGenerateContent?alt=sse
+with canned, CrewAI-parseable replies. Latency, streaming speed and error
+rates are configurable so the app can be load-tested without the real API.
+
+Point the app at it with (LiteLLM appends ':generateContent' to the base):
+    GEMINI_API_BASE=http://localhost:8080/v1beta/models/gemini-2.0-flash-exp
+
+Usage:
+    python -m loadtest.fake_gemini --port 8080 --latency lognormal:median_ms=800,sigma=0.5 \\
+        --token-interval-ms 15 --error-rate 0.02
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+# Matches the user query inside the retrieve task description (see tasks.yaml)
+QUERY_RE = re.compile(r"Given the user's (?:original )?query: '(?P<query>.*?)'", re.DOTALL)
+RETRIEVAL_TOOL_NAME = "Semantic Product Retriever"
+# Reported by /health so the load driver can tell this server from the real API
+FAKE_SERVICE_NAME = "fake-gemini"
+CANNED_ANSWER = (
+    "Based on our product catalog, the products retrieved above match your request. "
+    "This answer was generated by the local fake Gemini server for load testing."
+)
+
+
+class LatencyModel:
+    """
+    Samples time-to-first-token from a named distribution.
+
+    Spec format: '<kind>:<param>=<value>,...', for example
+      fixed:ms=200
+      uniform:low_ms=100,high_ms=900
+      normal:mean_ms=500,std_ms=100
+      lognormal:median_ms=800,sigma=0.5
+    """
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = {k: float(v) for k, v in (p.split("=") for p in params.split(",") if p)}
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+
+    def sample_seconds(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            ms = p["ms"]
+        elif self.kind == "uniform":
+            ms = random.uniform(p["low_ms"], p["high_ms"])
+        elif self.kind == "normal":
+            ms = random.gauss(p["mean_ms"], p["std_ms"])
+        else:
+            ms = random.lognormvariate(0, p["sigma"]) * p["median_ms"]
+        return max(ms, 0.0) / 1000.0
+
+
+class FakeGeminiConfig:
+    def __init__(self, latency: str, token_interval_ms: float, error_rate: float, error_codes: list[int]):
+        self.latency = LatencyModel(latency)
+        self.token_interval = token_interval_ms / 1000.0
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+
+
+config = FakeGeminiConfig("fixed:ms=0", 0, 0.0, [503])
+stats = {"requests": 0, "errors": 0, "streamed": 0}
+stats_lock = threading.Lock()
+
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    instruction = body.get("system_instruction") or body.get("systemInstruction") or {}
+    for part in instruction.get("parts", []):
+        parts.append(part.get("text", ""))
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+def _tool_already_called(body: dict) -> bool:
+    """
+    Whether the conversation already went past the first user turn.
+
+    CrewAI sends the agent's previous reply (the tool call) back as a model turn,
+    followed by the tool's observation. The system prompt can't be used for this:
+    it describes the ReAct format and always contains "Observation:".
+    """
+    contents = body.get("contents", [])
+    if any(content.get("role") == "model" for content in contents):
+        return True
+    return any(
+        "Observation:" in part.get("text", "")
+        for content in contents[1:]
+        for part in content.get("parts", [])
+    )
+
+
+def _reply_for(body: dict, prompt: str) -> str:
+    """Builds a ReAct-style reply: call the retrieval tool once, then answer."""
+    match = QUERY_RE.search(prompt)
+    query = match.group("query") if match else "product"
+    if RETRIEVAL_TOOL_NAME in prompt and not _tool_already_called(body):
+        return (
+            "Thought: I should search the product catalog for this query.\n"
+            f"Action: {RETRIEVAL_TOOL_NAME}\n"
+            f"Action Input: {json.dumps({'query': query})}"
+        )
+    return f"Thought: I now know the final answer\nFinal Answer: {CANNED_ANSWER}"
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\S+\s*", text)
+
+
+def _candidate(text: str, finish: bool) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    return candidate
+
+
+def _usage(prompt: str, reply: str) -> dict:
+    prompt_tokens, reply_tokens = len(_tokens(prompt)), len(_tokens(reply))
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": reply_tokens,
+        "totalTokenCount": prompt_tokens + reply_tokens,
+    }
+
+
+def _error_response():
+    code = random.choice(config.error_codes)
+    status = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}.get(code, "UNKNOWN")
+    return jsonify({"error": {"code": code, "message": "Injected error from fake Gemini server.", "status": status}}), code
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "healthy", "service": FAKE_SERVICE_NAME}), 200
+
+
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    with stats_lock:
+        return jsonify(dict(stats)), 200
+
+
+@app.route("/<path:model_path>", methods=["POST"])
+def generate(model_path: str):
+    if not (model_path.endswith(":generateContent") or model_path.endswith(":streamGenerateContent")):
+        return jsonify({"error": {"code": 404, "message": f"Unknown method: {model_path}", "status": "NOT_FOUND"}}), 404
+
+    streaming = model_path.endswith(":streamGenerateContent")
+    with stats_lock:
+        stats["requests"] += 1
+        stats["streamed"] += int(streaming)
+
+    time.sleep(config.latency.sample_seconds())
+    if random.random() < config.error_rate:
+        with stats_lock:
+            stats["errors"] += 1
+        return _error_response()
+
+    body = request.get_json(silent=True) or {}
+    prompt = _prompt_text(body)
+    reply = _reply_for(body, prompt)
+    model = model_path.rsplit("/", 1)[-1].split(":", 1)[0]
+
+    if not streaming:
+        time.sleep(config.token_interval * len(_tokens(reply)))
+        return jsonify({
+            "candidates": [_candidate(reply, finish=True)],
+            "usageMetadata": _usage(prompt, reply),
+            "modelVersion": model,
+        }), 200
+
+    def stream():
+        tokens = _tokens(reply)
+        for i, token in enumerate(tokens):
+            time.sleep(config.token_interval)
+            chunk = {"candidates": [_candidate(token, finish=i == len(tokens) - 1)], "modelVersion": model}
+            if i == len(tokens) - 1:
+                chunk["usageMetadata"] = _usage(prompt, reply)
+            yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+    return Response(stream(), mimetype="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_GEMINI_PORT", 8080)))
+    parser.add_argument("--latency", default=os.getenv("FAKE_GEMINI_LATENCY", "lognormal:median_ms=800,sigma=0.5"),
+                        help="Time-to-first-token distribution (see LatencyModel)")
+    parser.add_argument("--token-interval-ms", type=float, default=float(os.getenv("FAKE_GEMINI_TOKEN_INTERVAL_MS", 10)),
+                        help="Delay per generated token (streamed or not)")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("FAKE_GEMINI_ERROR_RATE", 0)),
+                        help="Fraction of requests answered with an injected error")
+    parser.add_argument("--error-codes", default=os.getenv("FAKE_GEMINI_ERROR_CODES", "503,429"),
+                        help="Comma-separated HTTP codes to pick injected errors from")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    global config
+    if args.seed is not None:
+        random.seed(args.seed)
+    config = FakeGeminiConfig(args.latency, args.token_interval_ms, args.error_rate,
+                              [int(code) for code in args.error_codes.split(",")])
+    print(f"Fake Gemini listening on {args.host}:{args.port} (latency={args.latency}, "
+          f"token_interval={args.token_interval_ms} ms, error_rate={args.error_rate})")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -61,7 +61,8 @@ if not settings.GEMINI_MODEL_NAME:
 llm = LLM(
     model=settings.GEMINI_MODEL_NAME,  # ← Cambio 1: Usar configuración desde settings
     temperature=0.7,
-    api_key=settings.GOOGLE_API_KEY
+    api_key=settings.GOOGLE_API_KEY,
+    api_base=settings.GEMINI_API_BASE  # None unless pointing at a local fake server
 )
 
 # 🔧 FIX: Instantiate the Semantic Retrieval Tool
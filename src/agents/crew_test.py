@@ -13,6 +13,7 @@ sys.path.insert(0, project_root)
 # 🔧 FIX: Import the SemanticRetrievalTool
 from src.agents.tools.semantic_retrieval_tool import SemanticRetrievalTool
 from src.data_pipeline.indexer import indexer  # Needed to ensure index is built
+from src.services.llm_service import ResilientLLM  # Deadlines, hedging, retries and circuit breaker
 
 # Define file paths for YAML configurations
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -58,10 +59,11 @@ if not settings.GEMINI_MODEL_NAME:
     exit(1)
 
 # 🔧 FIX: Usar la misma configuración que el código que funciona
-llm = LLM(
+llm = ResilientLLM(
     model=settings.GEMINI_MODEL_NAME,  # ← Cambio 1: Usar configuración desde settings
     temperature=0.7,
-    api_key=settings.GOOGLE_API_KEY
+    api_key=settings.GOOGLE_API_KEY,
+    api_base=settings.GEMINI_API_BASE  # None unless pointing at a local fake server
 )
 class ProductQueryCrew:
     """
@@ -1,5 +1,7 @@
 from crewai.tools import BaseTool
-from src.data_pipeline.retriever import product_retriever # Import the instantiated retriever
+from src.data_pipeline.retriever import get_product_retriever # Shared retriever, built on first use
+from src.data_pipeline.reranker import get_reranking_retriever # None unless RERANK_ENABLED=1
+from src.services.tenants import current_catalog # Catalog of the tenant being served, if any
 from src.config import settings # Import settings for top_k
 
 class SemanticRetrievalTool(BaseTool):
@@ -22,5 +24,11 @@ class SemanticRetrievalTool(BaseTool):
             list[dict]: A list of dictionaries, where each dictionary is a relevant product document.
                         Returns an empty list if no results are found.
         """
-        relevant_docs = product_retriever.get_relevant_context(query, top_k=settings.TOP_K_DOCS)
-        return relevant_docs
\ No newline at end of file
+        catalog = current_catalog()
+        if catalog is not None:
+            retriever = catalog.retriever
+        else:
+            retriever = get_reranking_retriever() or get_product_retriever()
+        relevant_docs = retriever.get_relevant_context(query, top_k=settings.TOP_K_DOCS)
+        # Retrieved documents are read-only views; hand the agent plain dicts it can serialize.
+        return [dict(doc) for doc in relevant_docs]
\ No newline at end of file
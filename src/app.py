@@ -1,7 +1,16 @@
-from flask import Flask, request, jsonify
-from src.schema import validate_query_request
-from src.agents.crew_test import product_query_crew
+from flask import Flask, request, jsonify, Response
+from src.schema import validate_query_request, validate_job_request
 from src.data_pipeline.indexer import indexer # Import the product_indexer
+from src.services.query_service import answer_query
+from src.services.llm_resilience import CircuitOpenError, DeadlineExceeded
+from src.services.jobs import job_manager, JobQueueFull
+from src.services.tenants import tenant_registry, tenant_catalog_exists, UnknownTenantError
+from src.services.profiling import (
+    request_profiler, memory_profiler, RequestProfiler, dump_collapsed, dump_pstats, dump_text
+)
+from src.config import settings
+import functools
+import hmac
 import os
 
 app = Flask(__name__)
@@ -12,26 +21,42 @@ app = Flask(__name__)
 print("Initializing RAG pipeline: Checking/building FAISS index...")
 try:
     indexer.index_products()
+    # Load the embedding model and the default catalog now rather than on the first request
+    tenant_registry.get()
     print("RAG pipeline initialized successfully.")
 except Exception as e:
     print(f"Error during RAG pipeline initialization: {e}")
     # Consider raising the exception here if the app cannot function without the index
     # raise e # Uncomment to prevent app from starting if indexing fails
 
+# Start the background workers that drain the /jobs queue
+job_manager.start()
+
+def _with_tenant_header(data: dict) -> dict:
+    """Takes the tenant from the X-Tenant-ID header when the body does not name one."""
+    tenant_id = request.headers.get("X-Tenant-ID")
+    if isinstance(data, dict) and tenant_id and "tenant_id" not in data:
+        return {**data, "tenant_id": tenant_id}
+    return data
+
 # --- Health Check Endpoint (Optional but Recommended) ---
 @app.route('/health', methods=['GET'])
 def health_check():
     """
     Provides a simple health check endpoint to confirm the application is running.
+    Reports the LLM endpoint override, if any, so the load driver can make sure
+    it is not about to send traffic to the real Gemini API.
     """
-    return jsonify({"status": "healthy", "message": "Product Query Bot is up and running!"}), 200
+    return jsonify({"status": "healthy", "message": "Product Query Bot is up and running!",
+                    "llm_api_base": settings.GEMINI_API_BASE}), 200
 
 # --- Main Query Endpoint ---
 @app.route('/query', methods=['POST'])
 def handle_query():
     """
     Handles incoming user queries, validates them, and processes them
-    through the multi-agent CrewAI pipeline.
+    through the multi-agent CrewAI pipeline. Plain catalog lookups that the
+    answer policy is confident about are answered from retrieval alone.
     """
     try:
         # 1. Get JSON data from the request
@@ -40,18 +65,25 @@ def handle_query():
             return jsonify({"error": "Request must be JSON"}), 400
 
         # 2. Validate input using schema.py
-        validated_data = validate_query_request(data)
+        validated_data = validate_query_request(_with_tenant_header(data))
         user_id = validated_data["user_id"]
         query = validated_data["query"]
+        tenant_id = validated_data["tenant_id"]
 
         print(f"Received query from user '{user_id}': '{query}'")
 
-        # 3. Execute the multi-agent CrewAI pipeline
-        # The product_query_crew handles both retrieval and response generation.
-        final_answer = product_query_crew.run_crew(user_id=user_id, query=query)
+        # 3. Run the tiered pipeline: high-confidence lookups skip the LLM,
+        # everything else goes through the multi-agent CrewAI pipeline
+        try:
+            answer = answer_query(user_id=user_id, query=query, tenant_id=tenant_id)
+        except UnknownTenantError as e:
+            return jsonify({"error": str(e)}), 404
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            status = 504 if isinstance(e, DeadlineExceeded) else 503
+            return jsonify({"error": "The answer service is temporarily unavailable.", "details": str(e)}), status
 
         # 4. Return the result
-        return jsonify({"user_id": user_id, "query": query, "response": final_answer}), 200
+        return jsonify({"user_id": user_id, "query": query, "response": answer.response, "tier": answer.tier}), 200
 
     except ValueError as e:
         # Handle validation errors from schema.py
@@ -62,6 +94,175 @@ def handle_query():
         print(f"An unexpected error occurred: {e}")
         return jsonify({"error": "An internal server error occurred.", "details": str(e)}), 500
 
+# --- Asynchronous Job Endpoints ---
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Enqueues a query for background processing and returns its job id immediately.
+    Accepts the /query fields plus an optional 'mode' ("answer" or "retrieval").
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Request must be JSON"}), 400
+
+        payload = validate_job_request(_with_tenant_header(data))
+        # Reject unknown tenants now rather than in a job that can only fail. Only
+        # the files are checked; loading the catalog is left to the worker.
+        if not tenant_catalog_exists(payload["tenant_id"]):
+            return jsonify({"error": f"No indexed catalog for tenant '{payload['tenant_id']}'."}), 400
+        job = job_manager.submit(payload)
+        print(f"Queued job {job.id} for user '{payload['user_id']}': '{payload['query']}'")
+        return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
+    except ValueError as e:
+        print(f"Validation Error: {e}")
+        return jsonify({"error": str(e)}), 400
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "5"}
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({"error": "An internal server error occurred.", "details": str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Returns a job's status and, once finished, its result or error.
+    Pass ?wait=<seconds> to long-poll until the job finishes (capped by JOB_MAX_WAIT_S).
+    """
+    try:
+        wait_s = min(float(request.args.get("wait", 0)), settings.JOB_MAX_WAIT_S)
+    except ValueError:
+        return jsonify({"error": "'wait' must be a number of seconds."}), 400
+
+    job = job_manager.backend.wait(job_id, wait_s) if wait_s > 0 else job_manager.backend.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found or expired."}), 404
+    return jsonify(job.to_dict()), 200
+
+# --- Admin Authentication ---
+def require_admin(view):
+    """Allows the request only with "Authorization: Bearer <ADMIN_TOKEN>"; hides the endpoint when no token is set."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not settings.ADMIN_TOKEN:
+            return jsonify({"error": "Not found."}), 404
+        supplied = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(supplied, f"Bearer {settings.ADMIN_TOKEN}".encode("utf-8")):
+            return jsonify({"error": "Admin token required."}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+# --- Tenant Metrics Endpoint ---
+@app.route('/tenants/metrics', methods=['GET'])
+@require_admin
+def tenant_metrics():
+    """
+    Reports per-tenant catalog load time, memory and hit rate, plus memory budget usage.
+    Admin only: the response names every tenant loaded in this process.
+    """
+    return jsonify(tenant_registry.metrics()), 200
+
+# --- Admin Profiling Endpoints ---
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+@require_admin
+def profiling_settings():
+    """
+    Shows or changes the profiling state.
+    POST {"enabled": true, "sample_rate": 0.05} switches request profiling at runtime.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        enabled = data.get("enabled")
+        sample_rate = data.get("sample_rate")
+        if enabled is not None and not isinstance(enabled, bool):
+            return jsonify({"error": "'enabled' must be true or false."}), 400
+        if sample_rate is not None and (isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float))):
+            return jsonify({"error": "'sample_rate' must be a number between 0 and 1."}), 400
+        try:
+            request_profiler.configure(enabled=enabled, sample_rate=sample_rate)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        print(f"Profiling settings changed: {request_profiler.status()}")
+    return jsonify({"requests": request_profiler.status(), "memory": memory_profiler.status()}), 200
+
+@app.route('/admin/profiling/profiles', methods=['GET', 'DELETE'])
+@require_admin
+def list_profiles():
+    """Lists the kept request profiles, newest first (DELETE drops them)."""
+    if request.method == 'DELETE':
+        request_profiler.clear()
+    return jsonify([profile.summary() for profile in request_profiler.profiles()]), 200
+
+@app.route('/admin/profiling/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    """
+    Returns one profile, or all kept profiles merged when profile_id is "aggregate".
+    ?format=json (summary, default) | text | pstats | collapsed (flame graph input).
+    """
+    if profile_id == "aggregate":
+        profile = RequestProfiler.merge(request_profiler.profiles())
+    else:
+        profile = request_profiler.get(profile_id)
+    if profile is None:
+        return jsonify({"error": f"Profile '{profile_id}' not found."}), 404
+
+    output = request.args.get("format", "json")
+    if output == "json":
+        return jsonify(profile.summary(top=request.args.get("top", 25, type=int))), 200
+    if output == "text":
+        return Response(dump_text(profile, sort=request.args.get("sort", "cumulative")), mimetype="text/plain")
+    if output == "collapsed":
+        return Response(dump_collapsed(profile), mimetype="text/plain")
+    if output == "pstats":
+        return Response(dump_pstats(profile), mimetype="application/octet-stream",
+                        headers={"Content-Disposition": f"attachment; filename={profile.id}.pstats"})
+    return jsonify({"error": "'format' must be json, text, pstats or collapsed."}), 400
+
+@app.route('/admin/profiling/memory/<action>', methods=['POST'])
+@require_admin
+def memory_tracing(action):
+    """Starts (?frames=N) or stops tracemalloc tracing."""
+    if action == "start":
+        return jsonify(memory_profiler.start(frames=request.args.get("frames", 1, type=int))), 200
+    if action == "stop":
+        return jsonify(memory_profiler.stop()), 200
+    return jsonify({"error": "Action must be 'start' or 'stop'."}), 404
+
+@app.route('/admin/profiling/memory/snapshots', methods=['POST'])
+@require_admin
+def take_memory_snapshot():
+    """Takes a tracemalloc snapshot and returns its id."""
+    try:
+        return jsonify({"snapshot_id": memory_profiler.snapshot()}), 201
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+@app.route('/admin/profiling/memory/snapshots/<snapshot_id>', methods=['GET'])
+@require_admin
+def memory_snapshot_top(snapshot_id):
+    """
+    Largest allocation sites in a snapshot, or their growth since it with ?diff=1.
+    ?to=<snapshot_id> compares with a later snapshot instead of the current heap.
+    ?group_by=lineno|filename|traceback, ?limit=25, ?include=*/src/* filter by file.
+    """
+    group_by = request.args.get("group_by", "lineno")
+    if group_by not in ("lineno", "filename", "traceback"):
+        return jsonify({"error": "'group_by' must be lineno, filename or traceback."}), 400
+    options = {"key_type": group_by, "limit": request.args.get("limit", 25, type=int),
+               "include": request.args.get("include")}
+    try:
+        if request.args.get("diff") == "1":
+            stats = memory_profiler.diff(snapshot_id, to_id=request.args.get("to"), **options)
+        else:
+            stats = memory_profiler.top(snapshot_id, **options)
+    except KeyError as e:
+        return jsonify({"error": f"Snapshot {e} not found."}), 404
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(stats), 200
+
 if __name__ == '__main__':
     # Set FLASK_DEBUG to 1 for development, 0 for production.
     # In a Docker setup, this might be handled via environment variables.
@@ -20,12 +20,128 @@ class Config:
     # Default to "gemini-pro" if not specified, adjust as needed (e.g., "gemini-2.0-flash")
     GEMINI_MODEL_NAME: str = os.getenv("GEMINI_MODEL_NAME")
 
+    # Optional override of the Gemini endpoint, e.g. the local fake server used for
+    # load tests: "http://fake-gemini:8080/v1beta/models/gemini-2.0-flash-exp".
+    # Unset (or empty) uses Google's API.
+    GEMINI_API_BASE: str = os.getenv("GEMINI_API_BASE") or None
+
     # Paths for data files
     # Ensure these paths are correct relative to where the script is run or adjusted for Docker
     PRODUCTS_DATA_PATH: str = "data/products.json"
     DOCS_DATA_PATH: str = "data/docs.json"
     FAISS_INDEX_PATH: str = "data/faiss.index"
 
+    # Multi-tenant catalogs: each tenant has its own products.json, docs.json and
+    # faiss.index under TENANT_DATA_DIR/<tenant_id>/. Requests without a tenant
+    # use the paths above. Loaded tenant catalogs share TENANT_MEMORY_BUDGET_MB and
+    # the least recently used ones are evicted beyond it.
+    TENANT_DATA_DIR: str = os.getenv("TENANT_DATA_DIR", "data/tenants")
+    TENANT_MEMORY_BUDGET_MB: float = float(os.getenv("TENANT_MEMORY_BUDGET_MB", 1024))
+
+    # Sentence embedding model, and where its vectors are cached between index
+    # rebuilds (keyed by model name and a hash of the embedded text)
+    EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+    EMBEDDING_STORE_PATH: str = os.getenv("EMBEDDING_STORE_PATH", "data/embeddings")
+
+    # Thread pool sizes for FAISS (OpenMP) and torch intra-op parallelism.
+    # Both libraries default to one thread per core, which oversubscribes the CPU
+    # once several requests are served in parallel. By default torch gets an equal
+    # share of the cores for each of the QUERY_WORKERS requests expected to encode
+    # queries at the same time. 0 keeps the library default.
+    QUERY_WORKERS: int = max(1, int(os.getenv("QUERY_WORKERS", 4)))
+    FAISS_OMP_THREADS: int = int(os.getenv("FAISS_OMP_THREADS", 1))
+    TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 1) // QUERY_WORKERS)))
+
+    # Vector compression for the FAISS index: "none" (float32 IndexFlatL2), "fp16" or
+    # "int8" (scalar quantization), or "pq" (product quantization into FAISS_PQ_M codes
+    # of FAISS_PQ_NBITS bits). FAISS_PCA_DIM > 0 first projects vectors onto that many
+    # trained PCA components. Training uses at most FAISS_TRAIN_SAMPLE vectors; the
+    # trained parameters are stored in the index file and the build settings next to it.
+    FAISS_COMPRESSION: str = os.getenv("FAISS_COMPRESSION", "none")
+    FAISS_PCA_DIM: int = int(os.getenv("FAISS_PCA_DIM", 0))
+    FAISS_PQ_M: int = int(os.getenv("FAISS_PQ_M", 48))
+    FAISS_PQ_NBITS: int = int(os.getenv("FAISS_PQ_NBITS", 8))
+    FAISS_TRAIN_SAMPLE: int = int(os.getenv("FAISS_TRAIN_SAMPLE", 100000))
+    # For compressed indexes: fetch FAISS_REFINE_FACTOR x top_k candidates and re-rank
+    # them by exact L2 distance against full-precision vectors memory-mapped from disk
+    # (0 = off). Exact distances also keep the LOOKUP_* thresholds meaningful.
+    FAISS_REFINE_FACTOR: int = int(os.getenv("FAISS_REFINE_FACTOR", 0))
+
+    # Optional second retrieval stage: over-fetch RERANK_CANDIDATES documents from
+    # FAISS and rerank them with a small cross-encoder within RERANK_BUDGET_MS.
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "0") == "1"
+    RERANK_MODEL_NAME: str = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", 20))
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", 16))
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", 150))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", 10000))
+
+    # Tiered answering: plain catalog lookups ("what is X?") are answered from the
+    # product fields, skipping the LLM, when the top FAISS match is within
+    # LOOKUP_MAX_DISTANCE and at least LOOKUP_MIN_MARGIN closer than the runner-up.
+    # Calibrate both with `python -m src.services.calibrate_answer_policy`.
+    # Leaving LOOKUP_MAX_DISTANCE unset disables the fast path.
+    LOOKUP_MAX_DISTANCE: float = float(os.getenv("LOOKUP_MAX_DISTANCE")) if os.getenv("LOOKUP_MAX_DISTANCE") else None
+    LOOKUP_MIN_MARGIN: float = float(os.getenv("LOOKUP_MIN_MARGIN", 0))
+
+    # End-to-end deadline for a /query request, propagated into every LLM call
+    REQUEST_DEADLINE_S: float = float(os.getenv("REQUEST_DEADLINE_S", 30))
+
+    # LLM call resilience: hedge a slow call after the LLM_HEDGE_PERCENTILE of recent
+    # latencies (never sooner than LLM_HEDGE_MIN_DELAY_MS), retry transient errors
+    # with jittered backoff, and open a circuit breaker after repeated failures.
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "1") == "1"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+    LLM_HEDGE_MIN_DELAY_MS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", 500))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", 2))
+    LLM_RETRY_BACKOFF_MS: float = float(os.getenv("LLM_RETRY_BACKOFF_MS", 200))
+    LLM_RETRY_BACKOFF_MAX_MS: float = float(os.getenv("LLM_RETRY_BACKOFF_MAX_MS", 2000))
+    LLM_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+    LLM_BREAKER_RESET_S: float = float(os.getenv("LLM_BREAKER_RESET_S", 30))
+    LLM_MAX_CONCURRENT_CALLS: int = int(os.getenv("LLM_MAX_CONCURRENT_CALLS", 64))
+    # When the LLM is unavailable or too slow, answer with the retrieved products
+    # instead of an error
+    LLM_DEGRADE_TO_RETRIEVAL: bool = os.getenv("LLM_DEGRADE_TO_RETRIEVAL", "1") == "1"
+
+    # Asynchronous job API (POST /jobs, GET /jobs/<id>)
+    # JOB_BACKEND is "memory" (in-process) or "sqlite" (survives restarts)
+    JOB_BACKEND: str = os.getenv("JOB_BACKEND", "memory")
+    JOB_SQLITE_PATH: str = os.getenv("JOB_SQLITE_PATH", "data/jobs.sqlite3")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 4))
+    JOB_MAX_QUEUE_DEPTH: int = int(os.getenv("JOB_MAX_QUEUE_DEPTH", 100))
+    JOB_RESULT_TTL_S: float = float(os.getenv("JOB_RESULT_TTL_S", 600))
+    JOB_MAX_WAIT_S: float = float(os.getenv("JOB_MAX_WAIT_S", 30))
+    JOB_DEADLINE_S: float = float(os.getenv("JOB_DEADLINE_S", 120))
+
+    # Token required (as "Authorization: Bearer <token>") by the /admin endpoints.
+    # Unset disables them.
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN") or None
+
+    # On-demand profiling of the query path (see src/services/profiling.py). Off by
+    # default and switchable at runtime through /admin/profiling. While enabled, a
+    # PROFILING_SAMPLE_RATE fraction of requests is profiled (one at a time) and the
+    # last PROFILING_MAX_PROFILES profiles are kept. Stacks for flame graphs are
+    # sampled every PROFILING_STACK_INTERVAL_MS.
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "0") == "1"
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", 0.01))
+    PROFILING_MAX_PROFILES: int = int(os.getenv("PROFILING_MAX_PROFILES", 50))
+    PROFILING_STACK_INTERVAL_MS: float = float(os.getenv("PROFILING_STACK_INTERVAL_MS", 5))
+
+    def tenant_paths(self, tenant_id: str = None) -> dict:
+        """Returns the products, docs and FAISS index paths for a tenant (None = default catalog)."""
+        if tenant_id is None:
+            return {
+                "products_data_path": self.PRODUCTS_DATA_PATH,
+                "docs_data_path": self.DOCS_DATA_PATH,
+                "faiss_index_path": self.FAISS_INDEX_PATH,
+            }
+        tenant_dir = os.path.join(self.TENANT_DATA_DIR, tenant_id)
+        return {
+            "products_data_path": os.path.join(tenant_dir, "products.json"),
+            "docs_data_path": os.path.join(tenant_dir, "docs.json"),
+            "faiss_index_path": os.path.join(tenant_dir, "faiss.index"),
+        }
+
     def __init__(self):
         # Basic validation for essential configurations
         if not self.GOOGLE_API_KEY:
@@ -0,0 +1,262 @@
+import os
+import glob
+import json
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+import numpy as np
+from src.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single writer assumed
+    fcntl = None
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed cache of text embeddings.
+
+    Vectors are keyed by (model name, SHA-256 of the embedded text). Each model
+    gets its own directory holding:
+      - vectors-<generation>.f32: a raw float32 array of shape (rows, dimension),
+        memory-mapped on read
+      - hashes-<generation>.txt: the text hash of each row, one per line
+      - index.json: the dimension and the current generation
+
+    New embeddings are appended to both files, so adding a batch costs O(batch)
+    rather than rewriting a full hash -> row mapping. gc compacts into a new
+    generation. Writers in different processes (e.g. the app's startup indexing
+    and the indexer CLI) serialize on an flock of store.lock and pick up each
+    other's rows before appending.
+
+    Rebuilding the FAISS index only needs to encode text that has never been
+    seen; everything else is read straight from the memory-mapped file.
+    """
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "store.lock"
+    HASH_LINE_BYTES = 65  # 64 hex digits and a newline
+
+    def __init__(self, model_name: str = None, store_path: str = None):
+        self.model_name = model_name or settings.EMBEDDING_MODEL_NAME
+        self.store_path = store_path or settings.EMBEDDING_STORE_PATH
+        # One directory per model so vectors from different models never mix
+        self.model_dir = os.path.join(self.store_path, self.model_name.replace('/', '__'))
+        self.index_path = os.path.join(self.model_dir, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        self._mmap = None
+        self.dimension, self.generation, self.rows = None, 0, {}
+        with self._lock, self._file_lock():
+            self._sync()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.model_dir, f"vectors-{self.generation}.f32")
+
+    @property
+    def hashes_path(self) -> str:
+        return self._hashes_path(self.generation)
+
+    def _hashes_path(self, generation: int) -> str:
+        return os.path.join(self.model_dir, f"hashes-{generation}.txt")
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Returns the content address of a text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the store directory, shared by every process using it."""
+        os.makedirs(self.model_dir, exist_ok=True)
+        with open(os.path.join(self.model_dir, self.LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """
+        Brings the in-memory view up to date with the files on disk. Caller holds
+        the file lock, so no other writer is halfway through an append.
+        """
+        if not os.path.exists(self.index_path):
+            self.dimension, self.generation, self.rows, self._mmap = None, 0, {}, None
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if "rows" in meta:
+            self._migrate_row_mapping(meta)
+        if meta["generation"] != self.generation or meta["dimension"] != self.dimension:
+            # Compacted (or created) by another process: reload from scratch
+            self.dimension, self.generation, self.rows, self._mmap = meta["dimension"], meta["generation"], {}, None
+        if not os.path.exists(self.vectors_path):
+            print(f"Embedding store vectors missing at {self.vectors_path}; starting empty.")
+            self.dimension, self.generation, self.rows, self._mmap = None, self.generation + 1, {}, None
+            return
+
+        # Only the rows added since the last sync are read
+        known = len(self.rows)
+        new_hashes = []
+        if os.path.exists(self.hashes_path):
+            with open(self.hashes_path, 'r', encoding='ascii') as f:
+                f.seek(known * self.HASH_LINE_BYTES)
+                new_hashes = [line[:-1] for line in f if len(line) == self.HASH_LINE_BYTES]
+        # Vectors are appended before their hashes, so a crashed write can leave
+        # vectors without a hash (or a partial line) behind; both are discarded.
+        vector_rows = os.path.getsize(self.vectors_path) // (self.dimension * 4)
+        new_hashes = new_hashes[:max(0, vector_rows - known)]
+        for offset, text_hash in enumerate(new_hashes):
+            self.rows[text_hash] = known + offset
+        self._truncate(len(self.rows))
+        if new_hashes:
+            self._mmap = None  # The file grew; remap on next read
+
+    def _truncate(self, rows: int):
+        for path, size in ((self.vectors_path, rows * self.dimension * 4), (self.hashes_path, rows * self.HASH_LINE_BYTES)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def _migrate_row_mapping(self, meta: dict):
+        """Moves the hash -> row mapping of stores written before hashes-<generation>.txt into that file."""
+        ordered = sorted(meta.pop("rows").items(), key=lambda item: item[1])
+        with open(self._hashes_path(meta["generation"]), 'w', encoding='ascii') as f:
+            f.writelines(f"{text_hash}\n" for text_hash, _ in ordered)
+        self._write_index(meta["dimension"], meta["generation"])
+
+    def _write_index(self, dimension: int, generation: int):
+        """Atomically replaces index.json."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"model_name": self.model_name, "dimension": dimension, "generation": generation}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _vectors(self) -> np.ndarray:
+        """Returns the stored vectors as a read-only memory map."""
+        if self._mmap is None and self.rows:
+            self._mmap = np.memmap(self.vectors_path, dtype='float32', mode='r', shape=(len(self.rows), self.dimension))
+        return self._mmap
+
+    def _append(self, hashes: list[str], vectors: np.ndarray):
+        # Caller holds the file lock and has just synced
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+            self._write_index(self.dimension, self.generation)
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dimension}).")
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype='float32').tobytes())
+        with open(self.hashes_path, 'a', encoding='ascii') as f:
+            f.writelines(f"{text_hash}\n" for text_hash in hashes)
+        start = len(self.rows)
+        for offset, text_hash in enumerate(hashes):
+            self.rows[text_hash] = start + offset
+        self._mmap = None  # The file grew; remap on next read
+
+    def get_or_encode(self, texts: list[str], encode) -> np.ndarray:
+        """
+        Returns embeddings for the given texts, encoding only those not stored yet.
+
+        Args:
+            texts (list[str]): The texts to embed.
+            encode (callable): Function mapping a list of texts to an (n, dim) array.
+                               Only called when at least one text is missing.
+
+        Returns:
+            np.ndarray: A float32 array of shape (len(texts), dimension), in input order.
+        """
+        if not texts:
+            return np.empty((0, self.dimension or 0), dtype='float32')
+        hashes = [self.text_hash(text) for text in texts]
+        with self._lock, self._file_lock():
+            # Another process may have added (or compacted) rows since we last looked
+            self._sync()
+            missing = {}
+            for text, text_hash in zip(texts, hashes):
+                if text_hash not in self.rows and text_hash not in missing:
+                    missing[text_hash] = text
+            if missing:
+                print(f"Encoding {len(missing)} new texts ({len(texts) - len(missing)} reused from the embedding store).")
+                self._append(list(missing), np.asarray(encode(list(missing.values())), dtype='float32'))
+            else:
+                print(f"All {len(texts)} embeddings found in the embedding store.")
+            vectors = self._vectors()
+            return np.array(vectors[[self.rows[text_hash] for text_hash in hashes]], dtype='float32')
+
+    def gc(self, referenced_texts: list[str]) -> int:
+        """
+        Removes rows whose text is no longer referenced and compacts the file.
+
+        Args:
+            referenced_texts (list[str]): Every text that must be kept.
+
+        Returns:
+            int: The number of rows removed.
+        """
+        keep = {self.text_hash(text) for text in referenced_texts}
+        with self._lock, self._file_lock():
+            self._sync()
+            kept = [text_hash for text_hash in self.rows if text_hash in keep]
+            removed = len(self.rows) - len(kept)
+            if removed == 0:
+                return 0
+            vectors = self._vectors()
+            compacted = np.array(vectors[[self.rows[text_hash] for text_hash in kept]], dtype='float32')
+            self._mmap = None
+            # Compact into new generation files and only then point index.json at
+            # them, so a crash at any step leaves a consistent generation.
+            old_paths = (self.vectors_path, self.hashes_path)
+            self.generation += 1
+            compacted.tofile(self.vectors_path)
+            with open(self.hashes_path, 'w', encoding='ascii') as f:
+                f.writelines(f"{text_hash}\n" for text_hash in kept)
+            self.rows = {text_hash: row for row, text_hash in enumerate(kept)}
+            self._write_index(self.dimension, self.generation)
+            for path in old_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            return removed
+
+    def stats(self) -> dict:
+        """Returns basic size information about the store."""
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        return {
+            "model_name": self.model_name,
+            "path": self.model_dir,
+            "dimension": self.dimension,
+            "generation": self.generation,
+            "rows": len(self.rows),
+            "vectors_bytes": size,
+        }
+
+def _catalog_texts() -> list[str]:
+    """
+    The texts the indexer embeds: every product description of the default
+    catalog and of each tenant catalog under TENANT_DATA_DIR.
+    """
+    paths = [settings.PRODUCTS_DATA_PATH]
+    paths += sorted(glob.glob(os.path.join(settings.TENANT_DATA_DIR, "*", "products.json")))
+    texts = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.extend(product['description'] for product in json.load(f))
+    return texts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clean up the persistent embedding store.")
+    parser.add_argument("command", choices=["stats", "gc"],
+                        help="'stats' prints store size; 'gc' drops vectors no product references anymore")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL_NAME)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(model_name=args.model)
+    if args.command == "gc":
+        removed = store.gc(_catalog_texts())
+        print(f"Removed {removed} unreferenced embeddings.")
+    print(json.dumps(store.stats(), indent=4))
@@ -1,22 +1,43 @@
 import os
 import json
+import argparse
 import faiss
-from sentence_transformers import SentenceTransformer
 from src.config import settings
+from src.schema import TENANT_ID_PATTERN
+from src.data_pipeline.embedding_store import EmbeddingStore
+from src.data_pipeline.retriever import reload_product_retriever
+from src.data_pipeline.vector_compression import (
+    build_index, exact_vectors_path, index_factory_string, load_metadata, metadata_path, save_exact_vectors
+)
 
 class ProductIndexer:
     """
     Handles the indexing of product descriptions into a FAISS vector store.
     """
-    def __init__(self):
-        # Initialize the Sentence Transformer model for embeddings.
-        # This will be refactored to use src/services/embedding_service.py later.
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.products_data_path = settings.PRODUCTS_DATA_PATH
-        self.docs_data_path = settings.DOCS_DATA_PATH
-        self.faiss_index_path = settings.FAISS_INDEX_PATH
+    def __init__(self, products_data_path: str = None, docs_data_path: str = None, faiss_index_path: str = None):
+        # The Sentence Transformer model is loaded lazily (see `model`): when every
+        # description is already in the embedding store, rebuilding the index
+        # never needs it.
+        self.model_name = settings.EMBEDDING_MODEL_NAME
+        self._model = None
+        self.embedding_store = EmbeddingStore(model_name=self.model_name)
+        self.products_data_path = products_data_path or settings.PRODUCTS_DATA_PATH
+        self.docs_data_path = docs_data_path or settings.DOCS_DATA_PATH
+        self.faiss_index_path = faiss_index_path or settings.FAISS_INDEX_PATH
         self.documents = []
         self.index = None
+        self.index_metadata = None
+        # Lossy indexes keep a full-precision copy on disk when shortlist re-ranking is on
+        self.factory = index_factory_string()
+        self.keep_exact_vectors = self.factory != "Flat" and settings.FAISS_REFINE_FACTOR > 0
+
+    @property
+    def model(self):
+        """The Sentence Transformer model, loaded on first use."""
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
 
     def _load_products(self):
         """Loads product data from the JSON file."""
@@ -28,40 +49,69 @@ class ProductIndexer:
         print(f"Loaded {len(self.documents)} products from {self.products_data_path}")
 
     def _create_embeddings(self):
-        """Creates embeddings for all product descriptions."""
+        """Creates embeddings for all product descriptions, reusing stored ones."""
         print("Creating embeddings for product descriptions...")
         descriptions = [doc['description'] for doc in self.documents]
-        embeddings = self.model.encode(descriptions, show_progress_bar=True)
+        embeddings = self.embedding_store.get_or_encode(
+            descriptions,
+            lambda texts: self.model.encode(texts, show_progress_bar=True)
+        )
         print("Embeddings created.")
         return embeddings
 
     def _build_faiss_index(self, embeddings):
-        """Builds and saves the FAISS index."""
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)  # L2 distance for similarity
-        self.index.add(embeddings)
-        print(f"FAISS index built with {self.index.ntotal} vectors.")
+        """Builds the FAISS index (L2 distance) with the configured compression."""
+        self.index, self.index_metadata = build_index(embeddings)
+        self.index_metadata.update(model_name=self.model_name, exact_vectors=self.keep_exact_vectors)
+        print(f"FAISS index built with {self.index.ntotal} vectors "
+              f"({self.factory}, {self.index_metadata['bytes_per_vector']} bytes per vector).")
 
-    def _save_index(self):
-        """Saves the FAISS index and processed documents."""
+    def _save_index(self, embeddings=None):
+        """Saves the FAISS index, its build metadata and the processed documents."""
         os.makedirs(os.path.dirname(self.faiss_index_path), exist_ok=True)
         faiss.write_index(self.index, self.faiss_index_path)
+        if self.keep_exact_vectors:
+            save_exact_vectors(embeddings, self.faiss_index_path)
+        elif os.path.exists(exact_vectors_path(self.faiss_index_path)):
+            os.remove(exact_vectors_path(self.faiss_index_path))
+        with open(metadata_path(self.faiss_index_path), 'w', encoding='utf-8') as f:
+            json.dump(self.index_metadata, f, indent=4)
         with open(self.docs_data_path, 'w', encoding='utf-8') as f:
             json.dump(self.documents, f, indent=4)
         print(f"FAISS index saved to {self.faiss_index_path}")
         print(f"Processed documents saved to {self.docs_data_path}")
 
+    def _index_is_current(self) -> bool:
+        """Whether the saved index was built with the configured compression."""
+        metadata = load_metadata(self.faiss_index_path)
+        return metadata["factory"] == self.factory and metadata.get("exact_vectors", False) == self.keep_exact_vectors
+
     def index_products(self):
         """Main method to load products, create embeddings, and build/save the index."""
         if os.path.exists(self.faiss_index_path) and os.path.exists(self.docs_data_path):
-            print("FAISS index and docs.json already exist. Skipping indexing.")
-            return
+            if self._index_is_current():
+                print("FAISS index and docs.json already exist. Skipping indexing.")
+                return
+            print(f"FAISS index compression changed to {self.factory}. Rebuilding...")
 
         print("Starting product indexing...")
         self._load_products()
         embeddings = self._create_embeddings()
         self._build_faiss_index(embeddings)
-        self._save_index()
+        self._save_index(embeddings)
+        # Anything that loaded the old index before this rebuild must not keep serving it
+        if reload_product_retriever(self.faiss_index_path):
+            print("Reloaded the product retriever with the rebuilt index.")
         print("Product indexing complete.")
 
 indexer = ProductIndexer()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAISS index for the default catalog or a tenant's catalog.")
+    parser.add_argument("--tenant", help="Tenant ID; indexes TENANT_DATA_DIR/<tenant>/products.json")
+    args = parser.parse_args()
+    # The tenant ID becomes a directory name under TENANT_DATA_DIR
+    if args.tenant is not None and not TENANT_ID_PATTERN.match(args.tenant):
+        parser.error(f"invalid tenant ID '{args.tenant}': it must be 1-64 letters, digits, '_' or '-'")
+
+    ProductIndexer(**settings.tenant_paths(args.tenant)).index_products()
@@ -0,0 +1,219 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from src.config import settings
+from src.data_pipeline.retriever import ProductRetriever, RetrievedDocument, get_product_retriever
+from src.services.profiling import profile_span
+
+class CrossEncoderReranker:
+    """
+    Re-scores first-stage candidates with a small CPU cross-encoder.
+
+    Scoring runs in batches under a per-request latency budget: a batch is only
+    started when the measured cost of a batch fits in what is left of it. If
+    the budget runs out partway, the scored head of the candidate list is
+    reranked and the unscored tail keeps its first-stage order. Scores are
+    cached per (query, document) pair in a bounded LRU cache.
+    """
+    def __init__(self, model=None, model_name: str = None, batch_size: int = None, cache_size: int = None,
+                 probe_interval_s: float = 1.0):
+        self.model_name = model_name or settings.RERANK_MODEL_NAME
+        if model is None:
+            # Imported here so the module loads without sentence-transformers
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(self.model_name, device='cpu')
+        self.model = model
+        self.batch_size = batch_size or settings.RERANK_BATCH_SIZE
+        self.cache_size = cache_size if cache_size is not None else settings.RERANK_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Same tokenizer thread-safety constraint as the retriever's encoder.
+        self._predict_lock = threading.Lock()
+        # Seconds per batch, only ever updated from measured batches. Used to
+        # avoid starting batches that cannot finish within the remaining budget.
+        self._batch_seconds = None
+        # While the estimate keeps requests from scoring anything, a dummy batch
+        # is timed in the background (at most every probe_interval_s) so the
+        # estimate can come down once the model is fast again.
+        self.probe_interval_s = probe_interval_s
+        self._probe_thread = None
+        self._last_probe = 0.0
+        self._probe_lock = threading.Lock()
+        self.model.predict([("warm up", "warm up")], batch_size=1)  # lazy initialisation, not timed
+        self._time_dummy_batch()
+
+    def _record_batch_seconds(self, elapsed: float):
+        # Rise at once to a slower measurement (so the next request doesn't
+        # overrun too), come down gradually as faster ones arrive.
+        if self._batch_seconds is None or elapsed > self._batch_seconds:
+            self._batch_seconds = elapsed
+        else:
+            self._batch_seconds = 0.5 * self._batch_seconds + 0.5 * elapsed
+
+    def _time_dummy_batch(self):
+        pairs = [("warm up", "warm up")] * self.batch_size
+        with self._predict_lock:
+            start = time.perf_counter()
+            self.model.predict(pairs, batch_size=self.batch_size)
+            self._record_batch_seconds(time.perf_counter() - start)
+
+    def _schedule_probe(self):
+        """Times a dummy batch off the request path, unless one ran recently."""
+        with self._probe_lock:
+            now = time.monotonic()
+            running = self._probe_thread is not None and self._probe_thread.is_alive()
+            if running or now - self._last_probe < self.probe_interval_s:
+                return
+            self._last_probe = now
+            self._probe_thread = threading.Thread(target=self._time_dummy_batch, name="rerank-probe", daemon=True)
+            self._probe_thread.start()
+
+    @staticmethod
+    def _doc_key(doc) -> str:
+        # The scored text itself, not the product id: ids are only unique within
+        # one tenant's catalog.
+        return doc.get("description", "")
+
+    def _cached_score(self, query: str, doc_key: str):
+        with self._cache_lock:
+            score = self._cache.get((query, doc_key))
+            if score is not None:
+                self._cache.move_to_end((query, doc_key))
+            return score
+
+    def _store_scores(self, query: str, doc_keys: list[str], scores):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            for doc_key, score in zip(doc_keys, scores):
+                self._cache[(query, doc_key)] = float(score)
+                self._cache.move_to_end((query, doc_key))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        """Drops all cached (query, document) scores."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _score_batch(self, query: str, docs: list, deadline: float):
+        """Scores one batch, or returns None if it cannot finish before the deadline."""
+        remaining = deadline - time.perf_counter()
+        if remaining <= self._batch_seconds:
+            return None
+        if not self._predict_lock.acquire(timeout=min(remaining - self._batch_seconds, threading.TIMEOUT_MAX)):
+            return None
+        try:
+            # Waiting for the lock used up part of the budget
+            if deadline - time.perf_counter() <= self._batch_seconds:
+                return None
+            start = time.perf_counter()
+            scores = self.model.predict([(query, doc["description"]) for doc in docs], batch_size=len(docs))
+            self._record_batch_seconds(time.perf_counter() - start)
+        finally:
+            self._predict_lock.release()
+        return scores
+
+    def rerank(self, query: str, candidates: list[RetrievedDocument], top_k: int, budget_ms: float = None) -> list[RetrievedDocument]:
+        """
+        Reorders first-stage candidates by cross-encoder relevance.
+
+        Args:
+            query (str): The user's query.
+            candidates (list[RetrievedDocument]): First-stage results, best match first.
+            top_k (int): The number of documents to return.
+            budget_ms (float, optional): Latency budget for scoring.
+                                         Defaults to settings.RERANK_BUDGET_MS.
+
+        Returns:
+            list[RetrievedDocument]: The top_k documents. The scored head of the candidate
+                                     list comes first in reranked order with rerank_score
+                                     set; candidates the budget left unscored follow in
+                                     first-stage order.
+        """
+        if budget_ms is None:
+            budget_ms = settings.RERANK_BUDGET_MS
+        deadline = time.perf_counter() + budget_ms / 1000.0
+
+        doc_keys = [self._doc_key(doc) for doc in candidates]
+        scores = [self._cached_score(query, key) for key in doc_keys]
+        pending = [i for i, score in enumerate(scores) if score is None]
+
+        # Only start the batches the measured cost says will fit, best first-stage candidates first
+        batches = math.ceil(len(pending) / self.batch_size)
+        affordable = min(batches, max(0, int((deadline - time.perf_counter()) / self._batch_seconds)))
+        if affordable == 0 and batches:
+            self._schedule_probe()
+        for start in range(0, affordable * self.batch_size, self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            batch_scores = self._score_batch(query, [candidates[i] for i in batch], deadline)
+            if batch_scores is None:
+                break
+            self._store_scores(query, [doc_keys[i] for i in batch], batch_scores)
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+
+        # Rerank the longest fully scored head; the rest keeps the first-stage order
+        head = next((i for i, score in enumerate(scores) if score is None), len(candidates))
+        if head < len(candidates):
+            print(f"Rerank budget of {budget_ms:.0f} ms exhausted; reranked {head} of {len(candidates)} candidates.")
+        # Stable sort keeps the first-stage order between equal scores
+        order = sorted(range(head), key=lambda i: -scores[i]) + list(range(head, len(candidates)))
+        return [replace(candidates[i], rank=rank, rerank_score=scores[i] if i < head else None)
+                for rank, i in enumerate(order[:top_k])]
+
+class RerankingRetriever:
+    """
+    Two-stage retriever: over-fetches candidates from the FAISS retriever and
+    reranks them with a cross-encoder. Exposes the same get_relevant_context
+    interface as ProductRetriever.
+    """
+    def __init__(self, retriever: ProductRetriever, reranker: CrossEncoderReranker = None, candidates: int = None):
+        self.retriever = retriever
+        self.reranker = reranker if reranker is not None else CrossEncoderReranker()
+        self.candidates = candidates or settings.RERANK_CANDIDATES
+
+    def get_relevant_context(self, query: str, top_k: int = None, budget_ms: float = None) -> list[RetrievedDocument]:
+        """
+        Retrieves the top-k documents for a query using both stages.
+
+        Args:
+            query (str): The user's query.
+            top_k (int, optional): The number of documents to return.
+                                   Defaults to settings.TOP_K_DOCS.
+            budget_ms (float, optional): Latency budget for the rerank stage.
+                                         Defaults to settings.RERANK_BUDGET_MS.
+
+        Returns:
+            list[RetrievedDocument]: The relevant product documents, best match first.
+        """
+        if top_k is None:
+            top_k = settings.TOP_K_DOCS
+        candidates = self.retriever.get_relevant_context(query, top_k=max(top_k, self.candidates))
+        with profile_span("rerank"):
+            return self.reranker.rerank(query, candidates, top_k=top_k, budget_ms=budget_ms)
+
+_reranking_retriever = None
+_reranking_retriever_lock = threading.Lock()
+
+def get_reranking_retriever():
+    """
+    Returns the shared two-stage retriever over the default catalog, built on
+    first use, or None unless RERANK_ENABLED=1 (the cross-encoder is only loaded then).
+    """
+    global _reranking_retriever
+    if not settings.RERANK_ENABLED:
+        return None
+    if _reranking_retriever is None:
+        with _reranking_retriever_lock:
+            if _reranking_retriever is None:
+                _reranking_retriever = RerankingRetriever(get_product_retriever())
+    return _reranking_retriever
+
+def __getattr__(name):
+    # Keeps `from src.data_pipeline.reranker import reranking_retriever` working
+    if name == "reranking_retriever":
+        return get_reranking_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
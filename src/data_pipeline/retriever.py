@@ -1,28 +1,104 @@
 import os
 import json
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
 import faiss
-from sentence_transformers import SentenceTransformer # Reverted: Directly import SentenceTransformer
+import numpy as np
 from src.config import settings
+from src.data_pipeline.thread_pools import configure_thread_pools
+from src.data_pipeline.vector_compression import load_exact_vectors, load_metadata, refine_search
+from src.services.profiling import profile_span
+
+@dataclass(frozen=True, eq=False, slots=True)
+class RetrievedDocument(Mapping):
+    """
+    Immutable, per-request view of a retrieved product document.
+
+    The product fields are read through to the shared catalog entry (no copy is
+    made) while the score lives on this object, so concurrent requests never see
+    each other's scores. It behaves like a read-only dict and still exposes the
+    '_score' key that callers used before, plus '_rerank_score' once a second
+    stage has rescored it.
+    """
+    document: Mapping
+    score: float
+    rank: int
+    rerank_score: float = None
+
+    def __getitem__(self, key):
+        if key == "_score":
+            return self.score
+        if key == "_rerank_score" and self.rerank_score is not None:
+            return self.rerank_score
+        return self.document[key]
+
+    def __iter__(self):
+        yield from self.document
+        yield "_score"
+        if self.rerank_score is not None:
+            yield "_rerank_score"
+
+    def __len__(self):
+        return len(self.document) + (1 if self.rerank_score is None else 2)
+
+    def to_dict(self) -> dict:
+        """Returns a plain dict copy, e.g. for JSON serialization."""
+        return dict(self)
 
 class ProductRetriever:
     """
     Handles the retrieval of relevant product documents from the FAISS index.
+
+    A single instance is safe to share across threads: the loaded documents are
+    read-only and each call returns its own RetrievedDocument objects.
     """
-    def __init__(self):
-        # Reverted: Initialize SentenceTransformer directly
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.docs_data_path = settings.DOCS_DATA_PATH
-        self.faiss_index_path = settings.FAISS_INDEX_PATH
-        self.documents = self._load_documents()
-        self.index = self._load_faiss_index()
+    def __init__(self, model=None, docs_data_path: str = None, faiss_index_path: str = None, tokenizer_lock=None):
+        if model is None:
+            # Imported here so the module (and code that only builds retrievers
+            # with their own encoder) loads without sentence-transformers
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+        self.model = model
+        self.docs_data_path = docs_data_path or settings.DOCS_DATA_PATH
+        self.faiss_index_path = faiss_index_path or settings.FAISS_INDEX_PATH
+        self.reload()
+        # HuggingFace fast tokenizers are not safe to call from several threads at
+        # once ("Already borrowed"), so tokenization is serialized. The model's
+        # forward pass and the FAISS search are read-only and run in parallel.
+        # Retrievers sharing a model must share this lock too (see for_catalog).
+        self._tokenizer_lock = tokenizer_lock or threading.Lock()
+
+    def reload(self):
+        """
+        (Re)loads the documents, the FAISS index and its build metadata from disk.
+
+        Used after the index is rebuilt in place; call it while no queries are
+        being served, since a search running during the swap could pair the old
+        index with the new documents.
+        """
+        documents = self._load_documents()
+        index = self._load_faiss_index()
+        # Compressed indexes built with exact vectors re-rank a shortlist by exact distance
+        index_metadata = load_metadata(self.faiss_index_path)
+        refine_factor = settings.FAISS_REFINE_FACTOR if index_metadata.get("exact_vectors") else 0
+        exact_vectors = load_exact_vectors(self.faiss_index_path, index.d) if refine_factor else None
+        self.documents, self.index, self.index_metadata = documents, index, index_metadata
+        self.refine_factor, self.exact_vectors = refine_factor, exact_vectors
+
+    def for_catalog(self, docs_data_path: str, faiss_index_path: str) -> "ProductRetriever":
+        """Returns a retriever over another catalog that reuses this one's embedding model."""
+        return ProductRetriever(model=self.model, docs_data_path=docs_data_path,
+                                faiss_index_path=faiss_index_path, tokenizer_lock=self._tokenizer_lock)
 
     def _load_documents(self):
-        """Loads processed documents from the JSON file."""
+        """Loads processed documents from the JSON file as read-only mappings."""
         if not os.path.exists(self.docs_data_path):
             raise FileNotFoundError(f"Processed documents file not found: {self.docs_data_path}. Please ensure indexing has been performed.")
         with open(self.docs_data_path, 'r', encoding='utf-8') as f:
             docs = json.load(f)
-        return docs
+        return tuple(MappingProxyType(doc) for doc in docs)
 
     def _load_faiss_index(self):
         """Loads the FAISS index from file."""
@@ -31,7 +107,28 @@ class ProductRetriever:
         index = faiss.read_index(self.faiss_index_path)
         return index
 
-    def get_relevant_context(self, query: str, top_k: int = None) -> list[dict]:
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Encodes a single query into a (1, dim) float32 array for FAISS."""
+        with profile_span("encode"):
+            if hasattr(self.model, "tokenize"):
+                embedding = self._embed(query)
+            else:
+                # Encoders without a separate tokenizer step (e.g. test doubles)
+                embedding = self.model.encode([query])
+        return np.ascontiguousarray(embedding, dtype='float32').reshape(1, -1) # Reshape for FAISS search
+
+    def _embed(self, query: str):
+        """SentenceTransformer.encode for one query, with only the tokenizer call under the lock."""
+        import torch
+        with self._tokenizer_lock:
+            features = self.model.tokenize([query])
+        features = {name: value.to(self.model.device) if hasattr(value, "to") else value
+                    for name, value in features.items()}
+        with torch.inference_mode():
+            embedding = self.model(features)["sentence_embedding"]
+        return embedding.float().cpu().numpy()
+
+    def get_relevant_context(self, query: str, top_k: int = None) -> list[RetrievedDocument]:
         """
         Retrieves the top-k most semantically similar product documents to the given query.
 
@@ -41,25 +138,62 @@ class ProductRetriever:
                                    Defaults to settings.TOP_K_DOCS.
 
         Returns:
-            list[dict]: A list of dictionaries, where each dictionary is a relevant product document.
+            list[RetrievedDocument]: The relevant product documents, best match first.
+                                     Each one is a read-only mapping with an extra '_score' key
+                                     (L2 distance, lower is closer).
         """
         if top_k is None:
             top_k = settings.TOP_K_DOCS
 
-        # Encode the query using self.model directly
-        query_embedding = self.model.encode([query]).reshape(1, -1) # Reshape for FAISS search
+        query_embedding = self._encode_query(query)
 
         # Perform a similarity search on the FAISS index
-        distances, indices = self.index.search(query_embedding, top_k)
+        with profile_span("faiss_search"):
+            if self.refine_factor:
+                distances, indices = refine_search(self.index, self.exact_vectors, query_embedding, top_k, self.refine_factor)
+            else:
+                distances, indices = self.index.search(query_embedding, top_k)
 
         relevant_docs = []
-        for i, idx in enumerate(indices[0]):
+        for rank, (idx, distance) in enumerate(zip(indices[0], distances[0])):
             if idx != -1: # Ensure the index is valid
-                doc = self.documents[idx]
-                doc["_score"] = float(distances[0][i]) # Add score for debugging/ranking insight
-                relevant_docs.append(doc)
+                relevant_docs.append(RetrievedDocument(document=self.documents[idx], score=float(distance), rank=rank))
 
         return relevant_docs
 
-# Instantiate the retriever
-product_retriever = ProductRetriever()
\ No newline at end of file
+_product_retriever = None
+_product_retriever_lock = threading.Lock()
+
+def get_product_retriever() -> ProductRetriever:
+    """
+    Returns the shared retriever over the default catalog, building it on first use.
+
+    Importing this module does not load the embedding model, the documents or
+    the FAISS index; the first call does.
+    """
+    global _product_retriever
+    if _product_retriever is None:
+        with _product_retriever_lock:
+            if _product_retriever is None:
+                # Size the FAISS/torch thread pools before the first query is served
+                configure_thread_pools()
+                _product_retriever = ProductRetriever()
+    return _product_retriever
+
+def reload_product_retriever(faiss_index_path: str) -> bool:
+    """
+    Reloads the shared retriever if it is already built over faiss_index_path,
+    so a rebuilt index is served without a restart. Returns whether it reloaded.
+    """
+    retriever = _product_retriever
+    if retriever is None or os.path.abspath(retriever.faiss_index_path) != os.path.abspath(faiss_index_path):
+        return False
+    retriever.reload()
+    return True
+
+def __getattr__(name):
+    # `from src.data_pipeline.retriever import product_retriever` keeps working
+    # and builds the shared retriever at that point
+    if name == "product_retriever":
+        return get_product_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,37 @@
+import faiss
+from src.config import settings
+
+def configure_thread_pools(faiss_threads: int = None, torch_threads: int = None) -> dict:
+    """
+    Sets the process-wide thread counts used by FAISS (OpenMP) and torch.
+
+    A single query only needs a few threads; letting both libraries spawn one
+    thread per core means concurrent requests fight over the CPU. Requests are
+    parallelised by the web server instead.
+
+    Args:
+        faiss_threads (int, optional): OpenMP threads for FAISS searches.
+                                       Defaults to settings.FAISS_OMP_THREADS.
+        torch_threads (int, optional): Intra-op threads for torch (embedding model).
+                                       Defaults to settings.TORCH_NUM_THREADS.
+                                       A value of 0 leaves the library default untouched.
+
+    Returns:
+        dict: The effective thread counts after configuration.
+    """
+    if faiss_threads is None:
+        faiss_threads = settings.FAISS_OMP_THREADS
+    if torch_threads is None:
+        torch_threads = settings.TORCH_NUM_THREADS
+
+    if faiss_threads > 0:
+        faiss.omp_set_num_threads(faiss_threads)
+    # Imported here so modules that only need FAISS can be loaded without torch
+    import torch
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+
+    return {
+        "faiss_threads": faiss.omp_get_max_threads(),
+        "torch_threads": torch.get_num_threads(),
+    }
@@ -0,0 +1,152 @@
+import os
+import json
+import faiss
+import numpy as np
+from src.config import settings
+
+# Supported vector encodings, by the FAISS index each one builds
+COMPRESSION_OPTIONS = {
+    "none": "Flat",      # float32, 4 bytes per dimension
+    "fp16": "SQfp16",    # scalar quantization to float16, 2 bytes per dimension
+    "int8": "SQ8",       # scalar quantization to 8 bits with trained per-dimension ranges
+    "pq": "PQ{m}x{nbits}",  # product quantization: m sub-vectors of nbits each
+}
+
+def index_factory_string(compression: str = None, pca_dim: int = None, pq_m: int = None, pq_nbits: int = None) -> str:
+    """
+    Returns the faiss.index_factory description for a compression setup.
+
+    Args:
+        compression (str, optional): One of COMPRESSION_OPTIONS. Defaults to settings.FAISS_COMPRESSION.
+        pca_dim (int, optional): Project onto this many PCA components first (0 = no PCA).
+                                 Defaults to settings.FAISS_PCA_DIM.
+        pq_m (int, optional): PQ sub-vectors. Defaults to settings.FAISS_PQ_M.
+        pq_nbits (int, optional): Bits per PQ sub-vector code. Defaults to settings.FAISS_PQ_NBITS.
+
+    Raises:
+        ValueError: If the compression option is unknown.
+    """
+    compression = compression or settings.FAISS_COMPRESSION
+    pca_dim = settings.FAISS_PCA_DIM if pca_dim is None else pca_dim
+    if compression not in COMPRESSION_OPTIONS:
+        raise ValueError(f"Unknown FAISS compression '{compression}'. Use one of: {', '.join(COMPRESSION_OPTIONS)}.")
+    encoding = COMPRESSION_OPTIONS[compression].format(m=pq_m or settings.FAISS_PQ_M,
+                                                       nbits=pq_nbits or settings.FAISS_PQ_NBITS)
+    return f"PCA{pca_dim},{encoding}" if pca_dim > 0 else encoding
+
+def _check_buildable(factory: str, dimension: int, n_train: int, pca_dim: int, pq_m: int, pq_nbits: int):
+    """Fails early with a readable message instead of a FAISS assertion."""
+    if pca_dim > 0:
+        if pca_dim >= dimension:
+            raise ValueError(f"FAISS_PCA_DIM ({pca_dim}) must be smaller than the embedding dimension ({dimension}).")
+        if n_train < pca_dim:
+            raise ValueError(f"PCA to {pca_dim} dimensions needs at least {pca_dim} training vectors, got {n_train}.")
+        dimension = pca_dim
+    if factory.endswith(f"PQ{pq_m}x{pq_nbits}"):
+        if dimension % pq_m:
+            raise ValueError(f"FAISS_PQ_M ({pq_m}) must divide the vector dimension ({dimension}).")
+        if n_train < 2 ** pq_nbits:
+            raise ValueError(f"PQ with {pq_nbits}-bit codes needs at least {2 ** pq_nbits} training vectors, "
+                             f"got {n_train}. Lower FAISS_PQ_NBITS or index more products.")
+
+def build_index(embeddings: np.ndarray, compression: str = None, pca_dim: int = None, pq_m: int = None,
+                pq_nbits: int = None, train_sample: int = None, seed: int = 0):
+    """
+    Trains (if needed) and fills a FAISS index with the given compression.
+
+    Trained parameters (PCA matrix, scalar quantizer ranges, PQ codebooks) are
+    part of the index and are written with faiss.write_index.
+
+    Args:
+        embeddings (np.ndarray): (n, d) float32 vectors.
+        compression, pca_dim, pq_m, pq_nbits: See index_factory_string.
+        train_sample (int, optional): Max vectors used for training, sampled at random.
+                                      Defaults to settings.FAISS_TRAIN_SAMPLE.
+        seed (int): Seed for the training sample.
+
+    Returns:
+        tuple[faiss.Index, dict]: The index and its build metadata.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n, dimension = embeddings.shape
+    pca_dim = settings.FAISS_PCA_DIM if pca_dim is None else pca_dim
+    pq_m = pq_m or settings.FAISS_PQ_M
+    pq_nbits = pq_nbits or settings.FAISS_PQ_NBITS
+    train_sample = train_sample or settings.FAISS_TRAIN_SAMPLE
+    factory = index_factory_string(compression, pca_dim, pq_m, pq_nbits)
+    if n > train_sample:
+        training = embeddings[np.sort(np.random.default_rng(seed).choice(n, size=train_sample, replace=False))]
+    else:
+        training = embeddings
+    _check_buildable(factory, dimension, len(training), pca_dim, pq_m, pq_nbits)
+
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+    n_train = 0
+    if not index.is_trained:
+        n_train = len(training)
+        index.train(training)
+    index.add(embeddings)
+
+    metadata = {
+        "factory": factory,
+        "dimension": dimension,
+        "ntotal": int(index.ntotal),
+        "trained_on": n_train,
+        "train_seed": seed if n_train else None,
+        "bytes_per_vector": bytes_per_vector(index),
+    }
+    return index, metadata
+
+def bytes_per_vector(index) -> int:
+    """Size of one encoded vector in the index, excluding shared trained parameters."""
+    return int(index.sa_code_size())
+
+def metadata_path(faiss_index_path: str) -> str:
+    return f"{faiss_index_path}.json"
+
+def exact_vectors_path(faiss_index_path: str) -> str:
+    return f"{faiss_index_path}.f32"
+
+def load_metadata(faiss_index_path: str) -> dict:
+    """Build metadata saved next to an index. Indexes without it are plain float32 flat indexes."""
+    path = metadata_path(faiss_index_path)
+    if not os.path.exists(path):
+        return {"factory": "Flat", "exact_vectors": False}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_exact_vectors(embeddings: np.ndarray, faiss_index_path: str):
+    """Writes full-precision vectors, row-aligned with the index, for shortlist re-ranking."""
+    np.ascontiguousarray(embeddings, dtype='float32').tofile(exact_vectors_path(faiss_index_path))
+
+def load_exact_vectors(faiss_index_path: str, dimension: int):
+    """Memory-maps the full-precision vectors; only the rows read during re-ranking are paged in."""
+    path = exact_vectors_path(faiss_index_path)
+    rows = os.path.getsize(path) // (4 * dimension)
+    return np.memmap(path, dtype='float32', mode='r', shape=(rows, dimension))
+
+def refine_search(index, exact_vectors, query_embedding: np.ndarray, top_k: int, refine_factor: int):
+    """
+    Searches a compressed index for a shortlist of refine_factor * top_k candidates
+    and re-ranks them by exact L2 distance against the full-precision vectors.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (1, top_k) distances and ids, like index.search.
+    """
+    _, candidates = index.search(query_embedding, top_k * refine_factor)
+    # Sorted ids read the memory-mapped file front to back
+    ids = np.sort(candidates[0][candidates[0] != -1])
+    distances = np.full((1, top_k), np.inf, dtype='float32')
+    indices = np.full((1, top_k), -1, dtype='int64')
+    if len(ids) == 0:
+        return distances, indices
+    exact = ((np.asarray(exact_vectors[ids]) - query_embedding[0]) ** 2).sum(axis=1)
+    order = np.argsort(exact, kind='stable')[:top_k]
+    distances[0, :len(order)] = exact[order]
+    indices[0, :len(order)] = ids[order]
+    return distances, indices
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray, top_k: int) -> float:
+    """Fraction of the exact top-k neighbours that the approximate search also returned in its top-k."""
+    hits = sum(len(set(a[:top_k]) & set(e[:top_k])) for a, e in zip(approx_ids, exact_ids))
+    return hits / (len(exact_ids) * top_k)
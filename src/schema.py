@@ -1,9 +1,15 @@
 import json
+import re
+
+# Tenant IDs name a catalog directory, so only a safe alphabet is accepted
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 def validate_query_request(data: dict):
     """
     Validates the incoming JSON data for the /query endpoint.
 
+    An optional 'tenant_id' selects the tenant's catalog; it is None when absent.
+
     Args:
         data (dict): The JSON payload from the request.
 
@@ -22,8 +28,35 @@ def validate_query_request(data: dict):
     if not query or not isinstance(query, str) or query.strip() == "":
         raise ValueError("Missing or invalid 'query'. It must be a non-empty string.")
 
+    tenant_id = data.get("tenant_id")
+    if tenant_id is not None and (not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.match(tenant_id)):
+        raise ValueError("Invalid 'tenant_id'. It must be 1-64 letters, digits, '_' or '-'.")
+
     # Return the stripped values to ensure no leading/trailing whitespace
     return {
         "user_id": user_id.strip(),
-        "query": query.strip()
-    }
\ No newline at end of file
+        "query": query.strip(),
+        "tenant_id": tenant_id
+    }
+
+def validate_job_request(data: dict):
+    """
+    Validates the incoming JSON data for the POST /jobs endpoint.
+
+    Accepts the same fields as /query plus an optional 'mode':
+    "answer" (default, full pipeline) or "retrieval" (retrieved products only).
+
+    Args:
+        data (dict): The JSON payload from the request.
+
+    Raises:
+        ValueError: If the data is invalid or missing required fields.
+    """
+    validated = validate_query_request(data)
+
+    mode = data.get("mode", "answer")
+    if mode not in ("answer", "retrieval"):
+        raise ValueError("Invalid 'mode'. It must be 'answer' or 'retrieval'.")
+
+    validated["mode"] = mode
+    return validated
@@ -0,0 +1,3 @@
+# This file marks the 'services' directory as a Python package.
+# It groups request-level services that sit between the Flask app and the
+# RAG pipeline, e.g. 'from src.services.answer_policy import answer_policy'.
@@ -0,0 +1,141 @@
+import re
+import threading
+from dataclasses import dataclass
+from src.config import settings
+from src.data_pipeline.retriever import ProductRetriever, RetrievedDocument, get_product_retriever
+
+# Tiers reported back to the client in the /query response
+TIER_RETRIEVAL = "retrieval"
+TIER_LLM = "llm"
+# Retrieval-only answer served because the LLM was unavailable or too slow
+TIER_RETRIEVAL_FALLBACK = "retrieval_fallback"
+
+# Phrasings of a plain "what is <product>?" lookup. The named group is the
+# product the user asked about.
+LOOKUP_INTENT_PATTERNS = [
+    re.compile(r"^(?:what\s+is|what's|whats)\s+(?:the\s+|a\s+|an\s+)?(?P<subject>.+?)\s*\??$", re.IGNORECASE),
+    re.compile(r"^(?:tell\s+me\s+about|describe|info(?:rmation)?\s+(?:about|on)|details\s+(?:about|on|of))\s+"
+               r"(?:the\s+)?(?P<subject>.+?)\s*\??$", re.IGNORECASE),
+]
+
+LOOKUP_ANSWER_TEMPLATE = "{title}: {description}"
+FALLBACK_ANSWER_HEADER = "We couldn't generate a detailed answer right now. These products from our catalog match your question:"
+FALLBACK_ANSWER_ITEM = "- {title}: {description}"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+@dataclass(frozen=True)
+class TieredAnswer:
+    """An answer to a query, tagged with the tier that produced it."""
+    response: str
+    tier: str
+
+@dataclass(frozen=True)
+class LookupCandidate:
+    """Threshold-independent facts the fast path decides on."""
+    document: RetrievedDocument
+    distance: float
+    margin: float
+    intent_matched: bool
+
+def _words(text: str) -> set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+class AnswerPolicy:
+    """
+    Decides whether a query can be answered straight from the catalog.
+
+    A query takes the retrieval tier when it reads as a lookup of a named
+    product, that name has exactly the words of the top match's title (so a
+    brand or a product type alone, which many titles share, does not match),
+    and the top FAISS match is both close enough and clearly ahead of the runner-up.
+    Everything else is left to the LLM crew.
+    """
+    def __init__(self, retriever: ProductRetriever, max_distance: float = None, min_margin: float = None):
+        self.retriever = retriever
+        self.max_distance = max_distance if max_distance is not None else settings.LOOKUP_MAX_DISTANCE
+        self.min_margin = min_margin if min_margin is not None else settings.LOOKUP_MIN_MARGIN
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_distance is not None
+
+    @staticmethod
+    def lookup_subject(query: str):
+        """Returns the product name a lookup query asks about, or None."""
+        for pattern in LOOKUP_INTENT_PATTERNS:
+            match = pattern.match(query.strip())
+            if match:
+                return match.group("subject")
+        return None
+
+    def evaluate(self, query: str):
+        """
+        Retrieves the best match for a query and measures it against the lookup rules.
+
+        Returns:
+            LookupCandidate | None: None when nothing was retrieved.
+        """
+        results = self.retriever.get_relevant_context(query, top_k=2)
+        if not results:
+            return None
+        top = results[0]
+        margin = results[1].score - top.score if len(results) > 1 else float("inf")
+        subject = self.lookup_subject(query)
+        intent_matched = subject is not None and _words(subject) == _words(top.get("title", ""))
+        return LookupCandidate(document=top, distance=top.score, margin=margin, intent_matched=intent_matched)
+
+    def accepts(self, candidate: LookupCandidate, max_distance: float = None, min_margin: float = None) -> bool:
+        """Whether a candidate clears the (given or configured) thresholds."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        min_margin = self.min_margin if min_margin is None else min_margin
+        return (
+            candidate is not None
+            and candidate.intent_matched
+            and candidate.distance <= max_distance
+            and candidate.margin >= min_margin
+        )
+
+    def fast_answer(self, query: str):
+        """
+        Answers a lookup query from the product fields when the policy allows it.
+
+        Returns:
+            TieredAnswer | None: The templated answer, or None if the query must go to the LLM.
+        """
+        if not self.enabled or self.lookup_subject(query) is None:
+            return None
+        candidate = self.evaluate(query)
+        if not self.accepts(candidate):
+            return None
+        doc = candidate.document
+        return TieredAnswer(
+            response=LOOKUP_ANSWER_TEMPLATE.format(title=doc["title"], description=doc["description"]),
+            tier=TIER_RETRIEVAL,
+        )
+
+    def retrieval_only_answer(self, query: str, top_k: int = None) -> TieredAnswer:
+        """Lists the best-matching products; used when the LLM tier cannot answer."""
+        docs = self.retriever.get_relevant_context(query, top_k=top_k or settings.TOP_K_DOCS)
+        lines = [FALLBACK_ANSWER_HEADER] + [
+            FALLBACK_ANSWER_ITEM.format(title=doc["title"], description=doc["description"]) for doc in docs
+        ]
+        return TieredAnswer(response="\n".join(lines), tier=TIER_RETRIEVAL_FALLBACK)
+
+_answer_policy = None
+_answer_policy_lock = threading.Lock()
+
+def get_answer_policy() -> AnswerPolicy:
+    """Returns the shared answer policy over the default catalog, built on first use."""
+    global _answer_policy
+    if _answer_policy is None:
+        with _answer_policy_lock:
+            if _answer_policy is None:
+                _answer_policy = AnswerPolicy(get_product_retriever())
+    return _answer_policy
+
+def __getattr__(name):
+    # Keeps `from src.services.answer_policy import answer_policy` working
+    if name == "answer_policy":
+        return get_answer_policy()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,79 @@
+"""
+Offline calibration of the tiered answer policy thresholds.
+
+Runs every labeled query through the retrieval tier's checks and grid-searches
+LOOKUP_MAX_DISTANCE / LOOKUP_MIN_MARGIN for the largest share of queries that
+can skip the LLM while keeping templated answers at or above --min-precision.
+A templated answer counts as correct when the query is labeled as a lookup and
+the top match is one of its relevant products.
+
+Usage (from the project root):
+    python -m src.services.calibrate_answer_policy --queries data/eval_queries.json --min-precision 0.95
+"""
+import argparse
+import json
+
+from src.data_pipeline.retriever import get_product_retriever
+from src.services.answer_policy import AnswerPolicy
+
+
+def calibrate(policy: AnswerPolicy, labeled_queries: list[dict], min_precision: float):
+    """
+    Picks the thresholds that maximize coverage subject to a precision floor.
+
+    Returns:
+        dict | None: The chosen thresholds with their precision and coverage,
+                     or None if no threshold reaches min_precision.
+    """
+    rows = []
+    for item in labeled_queries:
+        candidate = policy.evaluate(item["query"])
+        correct = bool(item.get("lookup")) and candidate is not None and candidate.document["id"] in item["relevant_ids"]
+        rows.append((candidate, correct))
+
+    eligible = [(c, ok) for c, ok in rows if c is not None and c.intent_matched]
+    distances = sorted({c.distance for c, _ in eligible})
+    margins = sorted({0.0} | {c.margin for c, _ in eligible if c.margin != float("inf")})
+
+    best = None
+    for max_distance in distances:
+        for min_margin in margins:
+            selected = [ok for c, ok in eligible if policy.accepts(c, max_distance, min_margin)]
+            if not selected:
+                continue
+            precision = sum(selected) / len(selected)
+            coverage = len(selected) / len(rows)
+            # Prefer more coverage, then a tighter distance and a wider margin
+            key = (coverage, -max_distance, min_margin)
+            if precision >= min_precision and (best is None or key > best["_key"]):
+                best = {"max_distance": max_distance, "min_margin": min_margin,
+                        "precision": precision, "coverage": coverage, "_key": key}
+    if best is not None:
+        best.pop("_key")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default="data/eval_queries.json")
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    args = parser.parse_args()
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        labeled_queries = json.load(f)
+
+    result = calibrate(AnswerPolicy(get_product_retriever()), labeled_queries, args.min_precision)
+    if result is None:
+        print(f"No thresholds reach precision {args.min_precision:.2f}; keep the fast path disabled.")
+        return
+
+    print(f"Templated answers: precision={result['precision']:.3f}, "
+          f"coverage={result['coverage']:.1%} of {len(labeled_queries)} labeled queries")
+    print("Add to .env:")
+    # Full precision: rounding the distance down would exclude the boundary query
+    print(f"LOOKUP_MAX_DISTANCE={result['max_distance']}")
+    print(f"LOOKUP_MIN_MARGIN={result['min_margin']}")
+
+
+if __name__ == "__main__":
+    main()
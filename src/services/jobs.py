@@ -0,0 +1,346 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from src.config import settings
+
+# Job lifecycle
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+TERMINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+# What a job runs: the full tiered answer pipeline, or retrieval only
+MODE_ANSWER = "answer"
+MODE_RETRIEVAL = "retrieval"
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth."""
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    payload: dict
+    result: object = None
+    error: str = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    expires_at: float = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["job_id"] = data.pop("id")
+        data.pop("expires_at")
+        return data
+
+class JobBackend(ABC):
+    """
+    Storage and queue for jobs. Subclasses implement persistence; long-polling
+    and TTL handling are shared.
+    """
+    def __init__(self, max_depth: int, result_ttl_s: float):
+        self.max_depth = max_depth
+        self.result_ttl_s = result_ttl_s
+        # Notified whenever a job is queued or finishes, to wake long-pollers and idle workers
+        self._changed = threading.Condition()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    @abstractmethod
+    def submit(self, payload: dict) -> Job:
+        """Queues a new job; raises JobQueueFull at max_depth."""
+
+    @abstractmethod
+    def claim(self, timeout: float):
+        """Takes the oldest queued job and marks it running; None if none arrives within timeout."""
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, result=None, error: str = None):
+        """Stores a job's outcome and starts its result TTL."""
+
+    @abstractmethod
+    def get(self, job_id: str):
+        """Returns a job, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Number of queued (not yet running) jobs."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Deletes finished jobs past their TTL; returns how many were removed."""
+
+    def wait(self, job_id: str, timeout: float):
+        """
+        Returns the job once it has finished, or its current state when timeout passes.
+        Returns None for unknown or expired jobs.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            with self._changed:
+                # Short cap so updates made by another process are also picked up
+                self._changed.wait(min(remaining, 0.5))
+
+class InMemoryJobBackend(JobBackend):
+    """Process-local backend. Fast, but queued jobs and results are lost on restart."""
+    def __init__(self, max_depth: int, result_ttl_s: float):
+        super().__init__(max_depth, result_ttl_s)
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, payload: dict) -> Job:
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, status=STATUS_QUEUED, payload=payload, created_at=now, updated_at=now)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job.id)
+            except queue.Full:
+                raise JobQueueFull(f"Job queue is full ({self.max_depth} jobs waiting).")
+            self._jobs[job.id] = job
+        self._notify()
+        # Return a snapshot: workers update the stored job in place
+        return Job(**asdict(job))
+
+    def claim(self, timeout: float):
+        try:
+            job_id = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status, job.updated_at = STATUS_RUNNING, time.time()
+            return Job(**asdict(job))
+
+    def finish(self, job_id: str, status: str, result=None, error: str = None):
+        now = time.time()
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status, job.result, job.error = status, result, error
+            job.updated_at, job.expires_at = now, now + self.result_ttl_s
+        self._notify()
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (job.expires_at is not None and job.expires_at <= time.time()):
+                return None
+            return Job(**asdict(job))
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.expires_at is not None and job.expires_at <= now]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+class SQLiteJobBackend(JobBackend):
+    """
+    File-backed backend that survives restarts.
+
+    Queued jobs and stored results persist in a SQLite file. On startup, jobs
+    left 'running' by a previous process are queued again, which assumes a single
+    app process owns the file.
+    """
+    def __init__(self, path: str, max_depth: int, result_ttl_s: float):
+        super().__init__(max_depth, result_ttl_s)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL,"
+                " result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+            requeued = conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (STATUS_QUEUED, STATUS_RUNNING)).rowcount
+        if requeued:
+            print(f"Re-queued {requeued} jobs interrupted by the previous shutdown.")
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement updates open explicit transactions
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        return Job(
+            id=row["id"], status=row["status"], payload=json.loads(row["payload"]),
+            result=json.loads(row["result"]) if row["result"] is not None else None,
+            error=row["error"], created_at=row["created_at"], updated_at=row["updated_at"],
+            expires_at=row["expires_at"],
+        )
+
+    def submit(self, payload: dict) -> Job:
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, status=STATUS_QUEUED, payload=payload, created_at=now, updated_at=now)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+                if depth >= self.max_depth:
+                    raise JobQueueFull(f"Job queue is full ({self.max_depth} jobs waiting).")
+                conn.execute(
+                    "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (job.id, job.status, json.dumps(payload), now, now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._notify()
+        return job
+
+    def _claim_once(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (STATUS_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                                 (STATUS_RUNNING, time.time(), row["id"]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        job.status = STATUS_RUNNING
+        return job
+
+    def claim(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim_once()
+            remaining = deadline - time.monotonic()
+            if job is not None or remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(remaining, 0.5))
+
+    def finish(self, job_id: str, status: str, result=None, error: str = None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, now + self.result_ttl_s, job_id),
+            )
+        self._notify()
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)", (job_id, time.time())
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)).rowcount
+
+def create_job_backend(kind: str = None) -> JobBackend:
+    """Builds the backend selected by settings.JOB_BACKEND ('memory' or 'sqlite')."""
+    kind = kind or settings.JOB_BACKEND
+    if kind == "memory":
+        return InMemoryJobBackend(settings.JOB_MAX_QUEUE_DEPTH, settings.JOB_RESULT_TTL_S)
+    if kind == "sqlite":
+        return SQLiteJobBackend(settings.JOB_SQLITE_PATH, settings.JOB_MAX_QUEUE_DEPTH, settings.JOB_RESULT_TTL_S)
+    raise ValueError(f"Unknown JOB_BACKEND '{kind}'. Use 'memory' or 'sqlite'.")
+
+class JobManager:
+    """
+    Runs queued jobs on a pool of background worker threads.
+
+    The handler receives a job payload and returns a JSON-serializable result;
+    any exception marks the job as failed with the error message.
+    """
+    def __init__(self, backend: JobBackend, handler, workers: int = None, purge_interval_s: float = 30.0):
+        self.backend = backend
+        self.handler = handler
+        self.workers = workers or settings.JOB_WORKERS
+        self.purge_interval_s = purge_interval_s
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker threads (idempotent)."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"Started {self.workers} job workers ({type(self.backend).__name__}).")
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, payload: dict) -> Job:
+        return self.backend.submit(payload)
+
+    def _work(self):
+        last_purge = time.monotonic()
+        while not self._stopping.is_set():
+            if time.monotonic() - last_purge >= self.purge_interval_s:
+                self.backend.purge_expired()
+                last_purge = time.monotonic()
+            job = self.backend.claim(timeout=1.0)
+            if job is None:
+                continue
+            try:
+                result = self.handler(job.payload)
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                self.backend.finish(job.id, STATUS_FAILED, error=str(e))
+            else:
+                self.backend.finish(job.id, STATUS_SUCCEEDED, result=result)
+
+def run_query_job(payload: dict) -> dict:
+    """Job handler: runs the tiered answer pipeline or retrieval only."""
+    # Imported here so the job machinery can be used without loading the models
+    from src.services.query_service import answer_query, retrieve_documents
+    if payload.get("mode", MODE_ANSWER) == MODE_RETRIEVAL:
+        return {"documents": retrieve_documents(payload["query"], tenant_id=payload.get("tenant_id"))}
+    answer = answer_query(payload["user_id"], payload["query"], deadline_s=settings.JOB_DEADLINE_S,
+                          tenant_id=payload.get("tenant_id"))
+    return {"response": answer.response, "tier": answer.tier}
+
+job_manager = JobManager(create_job_backend(), handler=run_query_job)
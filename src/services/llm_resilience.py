@@ -0,0 +1,260 @@
+import random
+import threading
+import time
+import contextvars
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+import litellm
+from src.config import settings
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's end-to-end deadline passes before the LLM answers."""
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the upstream while the circuit breaker is open."""
+
+# Errors worth retrying: throttling, upstream overload and network trouble
+TRANSIENT_ERRORS = (
+    litellm.exceptions.RateLimitError,
+    litellm.exceptions.ServiceUnavailableError,
+    litellm.exceptions.InternalServerError,
+    litellm.exceptions.APIConnectionError,
+    litellm.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+class Deadline:
+    """A point in (monotonic) time by which a request must be answered."""
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+_current_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Sets the deadline every LLM call made inside the block must respect."""
+    token = _current_deadline.set(Deadline(seconds))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+def current_deadline():
+    """Returns the active Deadline, or None outside a request_deadline block."""
+    return _current_deadline.get()
+
+class LatencyTracker:
+    """Rolling window of recent upstream latencies."""
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float):
+        """The p-th percentile in seconds, or None until enough samples exist."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast for `reset_timeout_s`. Then a single probe call is let through:
+    success closes the circuit, failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout_s: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+                self._state = self.HALF_OPEN
+                return True  # the probe
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_not_sent(self):
+        """An allowed call never reached the upstream, so there is no verdict on it."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                # Hand the probe to the next call; _opened_at is unchanged
+                self._state = self.OPEN
+
+class ResilientCaller:
+    """
+    Wraps a blocking upstream call with deadlines, hedging, retries and a circuit breaker.
+
+    - Deadline: each call waits at most until the active request_deadline.
+    - Hedging: if the first attempt has not answered after the configured latency
+      percentile, a duplicate is sent and the first successful response wins.
+      The loser is cancelled if it has not started; a running one cannot be
+      interrupted and is simply abandoned (its HTTP timeout is the deadline).
+    - Retries: transient errors are retried with full-jitter exponential backoff
+      while the deadline allows.
+    - Circuit breaker: repeated transient failures make calls fail fast with
+      CircuitOpenError until the upstream recovers.
+    """
+    def __init__(self, hedge_enabled: bool = None, hedge_percentile: float = None, hedge_min_delay_s: float = None,
+                 max_retries: int = None, backoff_base_s: float = None, backoff_max_s: float = None,
+                 breaker: CircuitBreaker = None, tracker: LatencyTracker = None, max_workers: int = None):
+        self.hedge_enabled = settings.LLM_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_percentile = hedge_percentile or settings.LLM_HEDGE_PERCENTILE
+        self.hedge_min_delay_s = hedge_min_delay_s if hedge_min_delay_s is not None else settings.LLM_HEDGE_MIN_DELAY_MS / 1000.0
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base_s = backoff_base_s if backoff_base_s is not None else settings.LLM_RETRY_BACKOFF_MS / 1000.0
+        self.backoff_max_s = backoff_max_s if backoff_max_s is not None else settings.LLM_RETRY_BACKOFF_MAX_MS / 1000.0
+        self.breaker = breaker or CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_S)
+        self.tracker = tracker or LatencyTracker()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or settings.LLM_MAX_CONCURRENT_CALLS,
+                                           thread_name_prefix="llm-call")
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None if hedging is off."""
+        if not self.hedge_enabled:
+            return None
+        observed = self.tracker.percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay_s, observed or 0.0)
+
+    def _submit(self, fn, args, kwargs, started: threading.Event):
+        def timed():
+            started.set()
+            start = time.monotonic()
+            result = fn(*args, **kwargs)
+            self.tracker.record(time.monotonic() - start)
+            return result
+        # Each attempt runs in its own copy of the caller's context, so the
+        # request deadline is visible inside the worker thread.
+        return self.executor.submit(contextvars.copy_context().run, timed)
+
+    def _attempt(self, fn, args, kwargs, deadline, started: threading.Event):
+        """
+        One (possibly hedged) attempt. Returns the first successful result.
+        `started` is set once a worker has begun calling the upstream.
+        """
+        start = time.monotonic()
+        hedge_delay = self.hedge_delay()
+        pending = {self._submit(fn, args, kwargs, started)}
+        hedged = False
+        last_error = None
+        while True:
+            timeouts = []
+            if deadline is not None:
+                timeouts.append(deadline.remaining())
+            if not hedged and hedge_delay is not None:
+                timeouts.append(hedge_delay - (time.monotonic() - start))
+            timeout = max(min(timeouts), 0) if timeouts else None
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                last_error = future.exception()
+            if last_error is not None and not pending:
+                raise last_error
+
+            if deadline is not None and deadline.expired:
+                for future in pending:
+                    future.cancel()
+                raise DeadlineExceeded("Request deadline exceeded while waiting for the LLM.")
+            if not hedged and hedge_delay is not None and time.monotonic() - start >= hedge_delay:
+                self._count("hedges")
+                pending.add(self._submit(fn, args, kwargs, started))
+                hedged = True
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Calls fn(*args, **kwargs) under the active deadline and resilience policy.
+
+        Raises:
+            CircuitOpenError: The upstream is considered unhealthy.
+            DeadlineExceeded: The request deadline passed.
+            Exception: A non-transient error from fn, or the last transient one
+                       once retries are exhausted.
+        """
+        deadline = current_deadline()
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("circuit_open")
+                raise CircuitOpenError("LLM circuit breaker is open; upstream considered unhealthy.")
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded("Request deadline exceeded before calling the LLM.")
+            self._count("attempts")
+            started = threading.Event()
+            try:
+                result = self._attempt(fn, args, kwargs, deadline, started)
+            except DeadlineExceeded:
+                # An attempt that spent the whole deadline queued for a free
+                # LLM_MAX_CONCURRENT_CALLS slot says nothing about the upstream
+                if started.is_set():
+                    self.breaker.record_failure()
+                else:
+                    self._count("deadline_before_send")
+                    self.breaker.record_not_sent()
+                raise
+            except TRANSIENT_ERRORS:
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                backoff = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+                if deadline is not None:
+                    backoff = min(backoff, max(deadline.remaining(), 0))
+                time.sleep(backoff)
+                continue
+            except Exception:
+                # The upstream answered (e.g. a 4xx), so it is reachable; do not
+                # leave a half-open breaker waiting for a verdict.
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,69 @@
+import contextvars
+import functools
+import litellm
+from crewai import LLM
+from src.services.llm_resilience import ResilientCaller, current_deadline
+from src.services.profiling import profile_span
+
+# Shared by every agent so hedging statistics and the circuit breaker reflect
+# the upstream as a whole
+llm_caller = ResilientCaller()
+
+# The unwrapped completion function (also when this module is imported again)
+_litellm_completion = getattr(litellm.completion, "__wrapped__", litellm.completion)
+
+# The caller of the ResilientLLM.call running in this context, if any
+_active_caller = contextvars.ContextVar("active_llm_caller", default=None)
+
+def _with_deadline_timeout(params: dict) -> dict:
+    """Caps the HTTP timeout of a completion call at the time left before the request deadline."""
+    deadline = current_deadline()
+    if deadline is None:
+        return params
+    remaining = max(deadline.remaining(), 0.001)
+    return {**params, "timeout": min(params.get("timeout") or remaining, remaining)}
+
+@functools.wraps(_litellm_completion)
+def resilient_completion(*args, **kwargs):
+    """
+    Stands in for litellm.completion. Inside ResilientLLM.call the request goes
+    through that LLM's ResilientCaller, so only the HTTP request is hedged and
+    retried: crewai's events, callbacks and token accounting around it run once.
+    Any other caller gets plain litellm.completion.
+    """
+    caller = _active_caller.get()
+    if caller is None:
+        return _litellm_completion(*args, **kwargs)
+    kwargs = _with_deadline_timeout(kwargs)
+    if kwargs.get("stream"):
+        # A stream returns as soon as the first chunk arrives; there is nothing to hedge
+        return _litellm_completion(*args, **kwargs)
+    return caller.call(_send_completion, *args, **kwargs)
+
+def _send_completion(*args, **kwargs):
+    # Runs in the attempt's own context copy: anything litellm calls from here is not wrapped again
+    _active_caller.set(None)
+    return _litellm_completion(*args, **kwargs)
+
+# crewai's LLM calls litellm.completion through the module attribute
+# (crewai==0.150.0, see test_llm_resilience.py), so this is where the policy applies
+litellm.completion = resilient_completion
+
+class ResilientLLM(LLM):
+    """
+    CrewAI LLM whose completion requests go through a ResilientCaller (deadline,
+    hedging, retries, circuit breaker). The request deadline also caps the HTTP
+    timeout of every completion request; a `timeout=` passed to the constructor
+    still applies when it is shorter.
+    """
+    def __init__(self, *args, caller: ResilientCaller = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.caller = caller or llm_caller
+
+    def call(self, *args, **kwargs):
+        token = _active_caller.set(self.caller)
+        try:
+            with profile_span("llm_call"):
+                return super().call(*args, **kwargs)
+        finally:
+            _active_caller.reset(token)
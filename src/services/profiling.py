@@ -0,0 +1,353 @@
+"""
+On-demand profiling of the query path.
+
+Off by default. When switched on (at startup via PROFILING_ENABLED or at runtime
+through the admin endpoints), a random PROFILING_SAMPLE_RATE fraction of
+requests is profiled:
+
+- cProfile records the request thread (embedding, FAISS search, reranking,
+  the crew and its tools), exportable as pstats or text;
+- a sampling thread records the request thread's stack every few milliseconds,
+  exportable as collapsed stacks for flame graphs (flamegraph.pl, speedscope);
+- named spans (encode, faiss_search, rerank, crew, llm_call, ...) give the
+  wall time of each stage, including time spent waiting on other threads.
+
+At most one request is profiled at a time (cProfile is process-wide on newer
+Pythons); requests that would be sampled while another is profiled are skipped.
+When profiling is off, the per-request cost is one attribute check and each
+span costs one ContextVar lookup.
+
+tracemalloc snapshots and diffs are handled separately by MemoryProfiler, so
+memory growth in the retriever and caches can be tracked between snapshots.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from src.config import settings
+
+# Profile of the request being served; None when the request is not sampled
+_current_profile: ContextVar = ContextVar("request_profile", default=None)
+
+@dataclass
+class RequestProfile:
+    """One sampled request: its cProfile stats, sampled stacks and stage timings."""
+    id: str
+    name: str
+    started_at: float
+    duration_s: float = 0.0
+    spans: Counter = field(default_factory=Counter)
+    span_calls: Counter = field(default_factory=Counter)
+    stacks: Counter = field(default_factory=Counter)
+    stats: pstats.Stats = None
+
+    def summary(self, top: int = 10) -> dict:
+        hot = []
+        if self.stats is not None:
+            rows = sorted(self.stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+            hot = [{"function": pstats.func_std_string(func), "calls": nc, "cumulative_s": ct}
+                   for func, (cc, nc, tt, ct, callers) in rows]
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "spans_s": dict(self.spans),
+            "span_calls": dict(self.span_calls),
+            "stack_samples": sum(self.stacks.values()),
+            "top_cumulative": hot,
+        }
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+def collapse_stack(frame) -> str:
+    """Formats a frame's stack root-first as 'outer;...;inner' (collapsed-stack format)."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval from a background thread."""
+    def __init__(self, thread_id: int, interval_s: float, stacks: Counter):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = stacks
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+            del frame
+
+class RequestProfiler:
+    """
+    Samples requests for CPU profiling and keeps the most recent profiles.
+
+    Args:
+        enabled (bool, optional): Defaults to settings.PROFILING_ENABLED.
+        sample_rate (float, optional): Fraction of requests profiled while enabled.
+                                       Defaults to settings.PROFILING_SAMPLE_RATE.
+        max_profiles (int, optional): Profiles kept in memory. Defaults to settings.PROFILING_MAX_PROFILES.
+        stack_interval_s (float, optional): Stack sampling interval.
+                                            Defaults to settings.PROFILING_STACK_INTERVAL_MS.
+    """
+    def __init__(self, enabled: bool = None, sample_rate: float = None, max_profiles: int = None,
+                 stack_interval_s: float = None):
+        self.enabled = settings.PROFILING_ENABLED if enabled is None else enabled
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.stack_interval_s = (
+            stack_interval_s if stack_interval_s is not None else settings.PROFILING_STACK_INTERVAL_MS / 1000.0
+        )
+        self._profiles = deque(maxlen=max_profiles or settings.PROFILING_MAX_PROFILES)
+        self._profiles_lock = threading.Lock()
+        self._active = threading.Lock()  # held while a request is being profiled
+        self.skipped_busy = 0
+
+    def configure(self, enabled: bool = None, sample_rate: float = None) -> dict:
+        """Switches profiling at runtime; returns the resulting status."""
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("'sample_rate' must be between 0 and 1.")
+            self.sample_rate = sample_rate
+        if enabled is not None:
+            self.enabled = enabled
+        return self.status()
+
+    def status(self) -> dict:
+        with self._profiles_lock:
+            kept = len(self._profiles)
+        return {"enabled": self.enabled, "sample_rate": self.sample_rate, "profiles": kept,
+                "max_profiles": self._profiles.maxlen, "skipped_busy": self.skipped_busy}
+
+    @contextmanager
+    def profile_request(self, name: str):
+        """
+        Profiles the enclosed block if this request is sampled.
+
+        Yields:
+            RequestProfile | None: The profile being recorded, or None when not sampled.
+        """
+        if not self.enabled or random.random() >= self.sample_rate or _current_profile.get() is not None:
+            yield None
+            return
+        if not self._active.acquire(blocking=False):
+            self.skipped_busy += 1
+            yield None
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, coverage, an outer cProfile) owns the
+            # interpreter hook: serve this request unprofiled rather than fail it
+            self._active.release()
+            self.skipped_busy += 1
+            yield None
+            return
+
+        record = RequestProfile(id=uuid.uuid4().hex, name=name, started_at=time.time())
+        token = _current_profile.set(record)
+        sampler = StackSampler(threading.get_ident(), self.stack_interval_s, record.stacks)
+        start = time.perf_counter()
+        try:
+            sampler.start()
+            try:
+                yield record
+            finally:
+                profile.disable()
+                sampler.stop()
+        finally:
+            _current_profile.reset(token)
+            self._active.release()
+            record.duration_s = time.perf_counter() - start
+            record.stats = pstats.Stats(profile)
+            with self._profiles_lock:
+                self._profiles.append(record)
+
+    def profiles(self) -> list[RequestProfile]:
+        """Kept profiles, newest first."""
+        with self._profiles_lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str):
+        return next((p for p in self.profiles() if p.id == profile_id), None)
+
+    def clear(self):
+        with self._profiles_lock:
+            self._profiles.clear()
+
+    @staticmethod
+    def merge(profiles: list[RequestProfile]) -> RequestProfile:
+        """Combines several profiles into one aggregate (stats, stacks and spans summed)."""
+        merged = RequestProfile(id="aggregate", name="aggregate", started_at=min((p.started_at for p in profiles), default=0.0))
+        for profile in profiles:
+            merged.duration_s += profile.duration_s
+            merged.spans.update(profile.spans)
+            merged.span_calls.update(profile.span_calls)
+            merged.stacks.update(profile.stacks)
+            if profile.stats is not None:
+                if merged.stats is None:
+                    merged.stats = pstats.Stats()
+                merged.stats.add(profile.stats)
+        return merged
+
+@contextmanager
+def profile_span(name: str):
+    """Adds the wall time of the enclosed block to the current request's profile, if any."""
+    record = _current_profile.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.spans[name] += time.perf_counter() - start
+        record.span_calls[name] += 1
+
+def dump_pstats(profile: RequestProfile) -> bytes:
+    """The profile in the binary pstats format (load with pstats.Stats, snakeviz, ...)."""
+    return marshal.dumps(profile.stats.stats if profile.stats is not None else {})
+
+def dump_collapsed(profile: RequestProfile) -> str:
+    """The sampled stacks in collapsed-stack format: one 'frame;frame;frame count' line per stack."""
+    return "".join(f"{stack} {count}\n" for stack, count in profile.stacks.most_common())
+
+def dump_text(profile: RequestProfile, sort: str = "cumulative", limit: int = 50) -> str:
+    """Human-readable pstats report."""
+    out = io.StringIO()
+    if profile.stats is not None:
+        stats = pstats.Stats(stream=out)
+        stats.add(profile.stats)
+        stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+class MemoryProfiler:
+    """
+    tracemalloc snapshots and diffs between them.
+
+    Tracing has a real cost (every allocation records a traceback), so it only
+    runs between start() and stop(); snapshots are kept in memory, oldest
+    dropped beyond max_snapshots.
+    """
+    # Allocation bookkeeping of the profilers themselves is noise in a diff
+    IGNORED = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 1) -> dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self) -> dict:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        return self.status()
+
+    def status(self) -> dict:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = list(self._snapshots)
+        return {"tracing": tracing, "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+                "traced_bytes": current, "peak_traced_bytes": peak, "snapshots": snapshots}
+
+    def snapshot(self) -> str:
+        """
+        Takes a snapshot and returns its id.
+
+        Raises:
+            RuntimeError: tracemalloc is not running (call start() first).
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is off; start it before taking snapshots.")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in self.IGNORED]
+        )
+        snapshot_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def diff(self, from_id: str, to_id: str = None, key_type: str = "lineno", limit: int = 25,
+             include: str = None) -> list[dict]:
+        """
+        Compares two snapshots (or a snapshot with a fresh one) and lists the largest changes.
+
+        Args:
+            from_id (str): The earlier snapshot.
+            to_id (str, optional): The later snapshot. Defaults to a new snapshot.
+            key_type (str): Group by "lineno", "filename" or "traceback".
+            limit (int): Number of entries returned, largest growth first.
+            include (str, optional): Only count allocations from files matching this
+                                     pattern, e.g. "*/src/*".
+
+        Raises:
+            KeyError: An unknown snapshot id.
+        """
+        with self._lock:
+            before = self._snapshots[from_id]
+            after = self._snapshots[to_id] if to_id else None
+        if after is None:
+            after = self._snapshots[self.snapshot()]
+        if include:
+            only = [tracemalloc.Filter(True, include)]
+            before, after = before.filter_traces(only), after.filter_traces(only)
+        return [
+            {
+                "location": [str(frame) for frame in stat.traceback],
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            for stat in after.compare_to(before, key_type)[:limit]
+        ]
+
+    def top(self, snapshot_id: str, key_type: str = "lineno", limit: int = 25, include: str = None) -> list[dict]:
+        """Largest allocation sites in one snapshot."""
+        with self._lock:
+            snapshot = self._snapshots[snapshot_id]
+        if include:
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(True, include)])
+        return [
+            {"location": [str(frame) for frame in stat.traceback], "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics(key_type)[:limit]
+        ]
+
+request_profiler = RequestProfiler()
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,54 @@
+from src.config import settings
+from src.agents.crew_test import product_query_crew
+from src.services.answer_policy import TieredAnswer, TIER_LLM
+from src.services.llm_resilience import request_deadline, CircuitOpenError, DeadlineExceeded
+from src.services.tenants import tenant_registry, tenant_scope
+from src.services.profiling import request_profiler, profile_span
+
+def answer_query(user_id: str, query: str, deadline_s: float = None, tenant_id: str = None) -> TieredAnswer:
+    """
+    Answers a user query with the tiered pipeline shared by /query and background jobs.
+
+    High-confidence catalog lookups are answered from retrieval alone; everything
+    else runs the multi-agent crew under an end-to-end deadline.
+
+    Args:
+        user_id (str): The ID of the user asking the question.
+        query (str): The user's question about a product.
+        deadline_s (float, optional): Deadline for the LLM tier in seconds.
+                                      Defaults to settings.REQUEST_DEADLINE_S.
+        tenant_id (str, optional): The catalog to answer from. Defaults to the default catalog.
+
+    Returns:
+        TieredAnswer: The answer and the tier that produced it.
+
+    Raises:
+        CircuitOpenError, DeadlineExceeded: The LLM tier could not answer and
+                                            LLM_DEGRADE_TO_RETRIEVAL is off.
+        UnknownTenantError: The tenant has no indexed catalog.
+    """
+    # A sampled fraction of requests is profiled while profiling is switched on
+    with request_profiler.profile_request("answer_query"):
+        with profile_span("tenant_lookup"):
+            catalog = tenant_registry.get(tenant_id)
+        with profile_span("answer_policy"):
+            fast_answer = catalog.answer_policy.fast_answer(query)
+        if fast_answer is not None:
+            return fast_answer
+
+        try:
+            # The retrieval tool inside the crew searches the catalog of the current tenant scope
+            with tenant_scope(catalog), request_deadline(deadline_s or settings.REQUEST_DEADLINE_S), profile_span("crew"):
+                # The product_query_crew handles both retrieval and response generation.
+                return TieredAnswer(response=product_query_crew.run_crew(user_id=user_id, query=query), tier=TIER_LLM)
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"LLM tier unavailable: {e}")
+            if not settings.LLM_DEGRADE_TO_RETRIEVAL:
+                raise
+            return catalog.answer_policy.retrieval_only_answer(query)
+
+def retrieve_documents(query: str, top_k: int = None, tenant_id: str = None) -> list[dict]:
+    """Runs only the retrieval pipeline on a tenant's catalog and returns the matching products as plain dicts."""
+    with request_profiler.profile_request("retrieve_documents"):
+        catalog = tenant_registry.get(tenant_id)
+        return [dict(doc) for doc in catalog.retriever.get_relevant_context(query, top_k=top_k)]
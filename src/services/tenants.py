@@ -0,0 +1,281 @@
+"""
+Per-tenant product catalogs.
+
+Each tenant (retailer) has its own products, documents and FAISS index under
+TENANT_DATA_DIR/<tenant_id>/, built ahead of time with
+`python -m src.data_pipeline.indexer --tenant <tenant_id>`. Catalogs are loaded
+on first use and kept in a registry that shares one memory budget: when the
+loaded catalogs exceed it, the least recently used ones are evicted. Requests
+without a tenant use the default catalog, which is never evicted once loaded.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+
+from src.config import settings
+from src.schema import TENANT_ID_PATTERN
+from src.data_pipeline.retriever import get_product_retriever, ProductRetriever
+from src.data_pipeline.reranker import get_reranking_retriever, RerankingRetriever
+from src.services.answer_policy import get_answer_policy, AnswerPolicy
+
+DEFAULT_TENANT = "default"
+
+class UnknownTenantError(KeyError):
+    """Raised when a tenant ID has no indexed catalog."""
+    def __str__(self):
+        # KeyError would repr() the message
+        return str(self.args[0]) if self.args else super().__str__()
+
+@dataclass(frozen=True)
+class TenantCatalog:
+    """A loaded catalog: what the retrieval tool searches and the answer policy over it."""
+    tenant_id: str
+    retriever: object  # ProductRetriever or RerankingRetriever
+    answer_policy: AnswerPolicy
+    memory_bytes: int = 0
+    load_seconds: float = 0.0
+
+@dataclass
+class TenantStats:
+    hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    load_failures: int = 0
+    evictions: int = 0
+    last_load_seconds: float = 0.0
+    total_load_seconds: float = 0.0
+    memory_bytes: int = 0
+
+    def to_dict(self, loaded: bool) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "loaded": loaded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "evictions": self.evictions,
+            "last_load_seconds": self.last_load_seconds,
+            "total_load_seconds": self.total_load_seconds,
+            "memory_bytes": self.memory_bytes if loaded else 0,
+        }
+
+def estimate_catalog_bytes(retriever: ProductRetriever) -> int:
+    """
+    Approximates the resident size of a loaded catalog.
+
+    The FAISS index is counted by its serialized size (for flat indexes this is
+    the vector matrix) and the documents by the size of their Python objects.
+    """
+    index_bytes = os.path.getsize(retriever.faiss_index_path) if os.path.exists(retriever.faiss_index_path) else 0
+    doc_bytes = 0
+    for doc in retriever.documents:
+        doc_bytes += sys.getsizeof(doc) + sum(sys.getsizeof(value) for value in doc.values())
+    return index_bytes + doc_bytes
+
+def tenant_catalog_exists(tenant_id: str = None) -> bool:
+    """
+    Whether a tenant ID is valid and has an indexed catalog on disk, without loading it.
+    None and DEFAULT_TENANT select the default catalog, which always exists.
+    """
+    if tenant_id is None or tenant_id == DEFAULT_TENANT:
+        return True
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        return False
+    paths = settings.tenant_paths(tenant_id)
+    return os.path.exists(paths["docs_data_path"]) and os.path.exists(paths["faiss_index_path"])
+
+def load_tenant_catalog(tenant_id: str) -> TenantCatalog:
+    """
+    Loads a tenant's catalog from TENANT_DATA_DIR, reusing the shared embedding
+    model and cross-encoder. DEFAULT_TENANT is the shared default catalog.
+
+    Raises:
+        UnknownTenantError: The tenant has no indexed catalog.
+    """
+    product_retriever = get_product_retriever()
+    reranking_retriever = get_reranking_retriever()
+    if tenant_id == DEFAULT_TENANT:
+        return TenantCatalog(
+            tenant_id=DEFAULT_TENANT,
+            retriever=reranking_retriever if reranking_retriever is not None else product_retriever,
+            answer_policy=get_answer_policy(),
+            memory_bytes=estimate_catalog_bytes(product_retriever),
+        )
+
+    if not tenant_catalog_exists(tenant_id):
+        raise UnknownTenantError(f"No indexed catalog for tenant '{tenant_id}'.")
+    paths = settings.tenant_paths(tenant_id)
+    retriever = product_retriever.for_catalog(paths["docs_data_path"], paths["faiss_index_path"])
+    if reranking_retriever is not None:
+        search = RerankingRetriever(retriever, reranker=reranking_retriever.reranker,
+                                    candidates=reranking_retriever.candidates)
+    else:
+        search = retriever
+    return TenantCatalog(tenant_id=tenant_id, retriever=search, answer_policy=AnswerPolicy(retriever),
+                         memory_bytes=estimate_catalog_bytes(retriever))
+
+class TenantRegistry:
+    """
+    Lazily loaded tenant catalogs under a shared memory budget.
+
+    Concurrent first requests for the same tenant share a single load: the
+    first caller loads the catalog and the others wait on its result. Loaded
+    catalogs are kept in LRU order; after each load the least recently used
+    ones are evicted until the total fits the budget again. Pinned tenants are
+    loaded on first use like the others and count against the budget, but are
+    never evicted. An evicted catalog stays alive until the requests already
+    using it finish.
+    """
+    def __init__(self, loader=load_tenant_catalog, memory_budget_bytes: int = None, pinned: tuple = ()):
+        self._loader = loader
+        self.memory_budget_bytes = (
+            memory_budget_bytes if memory_budget_bytes is not None
+            else int(settings.TENANT_MEMORY_BUDGET_MB * 1024 * 1024)
+        )
+        self._lock = threading.Lock()
+        self._pinned_ids = frozenset(pinned)
+        self._pinned = {}  # Loaded catalogs of pinned tenants
+        self._catalogs = OrderedDict()
+        self._loading = {}  # tenant_id -> Future of an in-flight load
+        self._stats = {}
+
+    def _tenant_stats(self, tenant_id: str) -> TenantStats:
+        stats = self._stats.get(tenant_id)
+        if stats is None:
+            stats = self._stats[tenant_id] = TenantStats()
+        return stats
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return self._memory_bytes()
+
+    def _memory_bytes(self) -> int:
+        return (sum(c.memory_bytes for c in self._pinned.values())
+                + sum(c.memory_bytes for c in self._catalogs.values()))
+
+    def get(self, tenant_id: str = None) -> TenantCatalog:
+        """
+        Returns a tenant's catalog, loading it on first use.
+
+        Args:
+            tenant_id (str, optional): The tenant. None selects the default catalog.
+
+        Raises:
+            UnknownTenantError: The tenant ID is invalid or has no indexed catalog.
+        """
+        tenant_id = tenant_id or DEFAULT_TENANT
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise UnknownTenantError(f"Invalid tenant ID '{tenant_id}'.")
+
+        with self._lock:
+            pinned = self._pinned.get(tenant_id)
+            if pinned is not None:
+                self._tenant_stats(tenant_id).hits += 1
+                return pinned
+            catalog = self._catalogs.get(tenant_id)
+            if catalog is not None:
+                self._catalogs.move_to_end(tenant_id)
+                self._tenant_stats(tenant_id).hits += 1
+                return catalog
+            self._tenant_stats(tenant_id).misses += 1
+            future = self._loading.get(tenant_id)
+            owner = future is None
+            if owner:
+                future = self._loading[tenant_id] = Future()
+
+        if not owner:
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            catalog = self._loader(tenant_id)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[tenant_id]
+                stats = self._tenant_stats(tenant_id)
+                if isinstance(e, UnknownTenantError) and stats.loads == 0:
+                    # Don't let requests for made-up tenants grow the metrics without bound
+                    del self._stats[tenant_id]
+                else:
+                    stats.load_failures += 1
+            future.set_exception(e)
+            raise
+        catalog = replace(catalog, load_seconds=time.perf_counter() - start)
+
+        with self._lock:
+            stats = self._tenant_stats(tenant_id)
+            stats.loads += 1
+            stats.last_load_seconds = catalog.load_seconds
+            stats.total_load_seconds += catalog.load_seconds
+            stats.memory_bytes = catalog.memory_bytes
+            if tenant_id in self._pinned_ids:
+                self._pinned[tenant_id] = catalog
+            else:
+                self._catalogs[tenant_id] = catalog
+            del self._loading[tenant_id]
+            self._evict_over_budget(keep=tenant_id)
+        print(f"Loaded catalog for tenant '{tenant_id}' in {catalog.load_seconds:.2f}s "
+              f"(~{catalog.memory_bytes / 1e6:.1f} MB)")
+        future.set_result(catalog)
+        return catalog
+
+    def _evict_over_budget(self, keep: str):
+        # Caller holds self._lock
+        while self._memory_bytes() > self.memory_budget_bytes:
+            victim = next((tenant_id for tenant_id in self._catalogs if tenant_id != keep), None)
+            if victim is None:
+                break
+            del self._catalogs[victim]
+            self._stats[victim].evictions += 1
+            print(f"Evicted catalog for tenant '{victim}' (memory budget {self.memory_budget_bytes} bytes)")
+
+    def evict(self, tenant_id: str) -> bool:
+        """Drops a loaded (non-pinned) catalog; returns whether it was loaded."""
+        with self._lock:
+            if self._catalogs.pop(tenant_id, None) is None:
+                return False
+            self._stats[tenant_id].evictions += 1
+            return True
+
+    def metrics(self) -> dict:
+        """Per-tenant load time, memory and hit-rate counters plus the overall budget usage."""
+        with self._lock:
+            loaded = set(self._pinned) | set(self._catalogs)
+            return {
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "memory_bytes": self._memory_bytes(),
+                "loaded_tenants": len(loaded),
+                "loading_tenants": len(self._loading),
+                "tenants": {
+                    tenant_id: dict(stats.to_dict(tenant_id in loaded), pinned=tenant_id in self._pinned_ids)
+                    for tenant_id, stats in self._stats.items()
+                },
+            }
+
+# The catalog of the request being served, read by the retrieval tool inside the crew
+_current_catalog: ContextVar = ContextVar("tenant_catalog", default=None)
+
+@contextmanager
+def tenant_scope(catalog: TenantCatalog):
+    """Makes `catalog` the current catalog for the duration of the block."""
+    token = _current_catalog.set(catalog)
+    try:
+        yield catalog
+    finally:
+        _current_catalog.reset(token)
+
+def current_catalog():
+    """Returns the catalog selected for the current request, or None outside a tenant scope."""
+    return _current_catalog.get()
+
+# The default catalog (and the embedding model) is loaded by the first request
+# without a tenant, or by the app at startup
+tenant_registry = TenantRegistry(pinned=(DEFAULT_TENANT,))
@@ -66,7 +66,9 @@ def test_tool_with_mock():
         from src.agents.tools.semantic_retrieval_tool import SemanticRetrievalTool
         
         # Mock the retriever to return test data
-        with patch('src.agents.tools.semantic_retrieval_tool.product_retriever') as mock_retriever:
+        with patch('src.agents.tools.semantic_retrieval_tool.get_reranking_retriever', return_value=None), \
+             patch('src.agents.tools.semantic_retrieval_tool.get_product_retriever') as mock_get_retriever:
+            mock_retriever = mock_get_retriever.return_value
             # Set up fake return data
             mock_retriever.get_relevant_context.return_value = [
                 {
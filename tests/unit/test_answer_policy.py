@@ -0,0 +1,84 @@
+# test_answer_policy.py
+"""
+Tests for the tiered answer policy and its offline calibration, using a
+fake retriever with fixed distances.
+"""
+from src.data_pipeline.retriever import RetrievedDocument
+from src.services.answer_policy import AnswerPolicy, TIER_RETRIEVAL
+from src.services.calibrate_answer_policy import calibrate
+
+GEL = {"id": "4", "title": "Zubale Styling Gel", "description": "Alcohol-free gel that holds your style all day."}
+SPRAY = {"id": "5", "title": "Zubale Hair Spray", "description": "Flexible hold spray for all hair types."}
+
+
+class FakeRetriever:
+    """Returns preset (document, distance) pairs per query."""
+
+    def __init__(self, results):
+        self.results = results
+
+    def get_relevant_context(self, query, top_k=None):
+        hits = self.results[query][:top_k]
+        return [RetrievedDocument(document=doc, score=distance, rank=i) for i, (doc, distance) in enumerate(hits)]
+
+
+RESULTS = {
+    "what is Zubale Styling Gel?": [(GEL, 0.4), (SPRAY, 1.2)],
+    "tell me about the zubale styling gel": [(GEL, 0.6), (SPRAY, 1.1)],
+    "what is Zubale Body Lotion?": [(SPRAY, 0.9), (GEL, 1.0)],
+    "I need something to hold my hairstyle all day": [(GEL, 0.3), (SPRAY, 0.5)],
+    "what is gel?": [(GEL, 0.3), (SPRAY, 1.2)],
+    "what is zubale?": [(GEL, 0.3), (SPRAY, 1.2)],
+}
+
+
+def test_lookup_subject_extraction():
+    """Test 1: Lookup phrasings are recognised and other questions are not."""
+    assert AnswerPolicy.lookup_subject("What is Zubale Styling Gel?") == "Zubale Styling Gel"
+    assert AnswerPolicy.lookup_subject("tell me about the Zubale Hair Mask") == "Zubale Hair Mask"
+    assert AnswerPolicy.lookup_subject("which gel holds best?") is None
+
+
+def test_fast_answer_requires_intent_title_and_threshold():
+    """Test 2: Only confident lookups of the top product are templated."""
+    policy = AnswerPolicy(FakeRetriever(RESULTS), max_distance=0.5, min_margin=0.2)
+
+    answer = policy.fast_answer("what is Zubale Styling Gel?")
+    assert answer.tier == TIER_RETRIEVAL
+    assert answer.response.startswith("Zubale Styling Gel: Alcohol-free gel")
+
+    assert policy.fast_answer("tell me about the zubale styling gel") is None  # too far
+    assert policy.fast_answer("what is Zubale Body Lotion?") is None  # name not in the top title
+    assert policy.fast_answer("I need something to hold my hairstyle all day") is None  # not a lookup
+
+
+def test_partial_product_names_do_not_match_a_title():
+    """Test 3: A product type or the brand alone is not a lookup of one product, however close the match."""
+    policy = AnswerPolicy(FakeRetriever(RESULTS), max_distance=0.5, min_margin=0.2)
+
+    assert not policy.evaluate("what is gel?").intent_matched
+    assert not policy.evaluate("what is zubale?").intent_matched
+    assert policy.fast_answer("what is gel?") is None
+    assert policy.fast_answer("what is zubale?") is None
+
+
+def test_fast_path_disabled_without_threshold():
+    """Test 4: With no calibrated distance every query goes to the LLM."""
+    policy = AnswerPolicy(FakeRetriever(RESULTS), max_distance=None)
+    assert not policy.enabled
+    assert policy.fast_answer("what is Zubale Styling Gel?") is None
+
+
+def test_calibration_maximizes_coverage_at_target_precision():
+    """Test 5: Calibration picks the loosest thresholds that stay precise."""
+    labeled = [
+        {"query": "what is Zubale Styling Gel?", "relevant_ids": ["4"], "lookup": True},
+        {"query": "tell me about the zubale styling gel", "relevant_ids": ["4"], "lookup": True},
+        {"query": "what is Zubale Body Lotion?", "relevant_ids": [], "lookup": True},
+        {"query": "I need something to hold my hairstyle all day", "relevant_ids": ["4"], "lookup": False},
+    ]
+    result = calibrate(AnswerPolicy(FakeRetriever(RESULTS), max_distance=0.0), labeled, min_precision=1.0)
+
+    assert result["precision"] == 1.0
+    assert result["coverage"] == 0.5
+    assert abs(result["max_distance"] - 0.6) < 1e-9
@@ -0,0 +1,117 @@
+# test_app.py
+"""
+Tests for the Flask endpoints that don't need the models or the LLM: job
+submission and the admin-gated endpoints. Startup indexing, catalog loading and
+the job workers are replaced before the app is imported.
+"""
+import pytest
+
+pytest.importorskip("crewai")
+
+
+class RecordingRegistry:
+    """Stands in for TenantRegistry.get and records which tenants were loaded."""
+
+    def __init__(self):
+        self.loads = []
+
+    def get(self, tenant_id=None):
+        self.loads.append(tenant_id)
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    from src.data_pipeline.indexer import indexer
+    from src.services import tenants
+    from src.services.jobs import job_manager
+
+    registry = RecordingRegistry()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(indexer, "index_products", lambda: None)
+        mp.setattr(tenants.tenant_registry, "get", registry.get)
+        mp.setattr(job_manager, "start", lambda: None)
+        from src import app as app_module
+        app_module.test_registry = registry
+        yield app_module
+
+
+@pytest.fixture
+def client(app_module, tmp_path, monkeypatch):
+    tenant_dir = tmp_path / "acme"
+    tenant_dir.mkdir()
+    (tenant_dir / "docs.json").write_text("[]")
+    (tenant_dir / "faiss.index").write_bytes(b"")
+    monkeypatch.setattr("src.services.tenants.settings.TENANT_DATA_DIR", str(tmp_path))
+    app_module.test_registry.loads.clear()
+    return app_module.app.test_client()
+
+
+def test_job_for_unknown_tenant_is_rejected(client, app_module):
+    """Test 1: Unknown or invalid tenants get a 400 and nothing is queued or loaded."""
+    for tenant_id in ("umbrella", "../acme"):
+        response = client.post("/jobs", json={"user_id": "u1", "query": "gel", "tenant_id": tenant_id})
+        assert response.status_code == 400
+    response = client.post("/jobs", json={"user_id": "u1", "query": "gel"}, headers={"X-Tenant-ID": "umbrella"})
+    assert response.status_code == 400
+    assert app_module.test_registry.loads == []
+
+
+def test_job_for_known_tenant_is_queued_without_loading_its_catalog(client, app_module):
+    """Test 2: A known tenant's job is accepted with 202; the catalog is only loaded by the worker."""
+    response = client.post("/jobs", json={"user_id": "u1", "query": "gel", "tenant_id": "acme", "mode": "retrieval"})
+
+    assert response.status_code == 202
+    job = app_module.job_manager.backend.get(response.get_json()["job_id"])
+    assert job.status == "queued" and job.payload["tenant_id"] == "acme"
+    assert app_module.test_registry.loads == []
+
+
+def test_tenant_metrics_require_the_admin_token(client, monkeypatch):
+    """Test 3: /tenants/metrics is hidden without ADMIN_TOKEN and needs it once set."""
+    monkeypatch.setattr("src.app.settings.ADMIN_TOKEN", None)
+    assert client.get("/tenants/metrics").status_code == 404
+
+    monkeypatch.setattr("src.app.settings.ADMIN_TOKEN", "s3cret")
+    assert client.get("/tenants/metrics").status_code == 401
+    response = client.get("/tenants/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "tenants" in response.get_json()
+
+
+ADMIN_ENDPOINTS = [
+    ("GET", "/admin/profiling"),
+    ("POST", "/admin/profiling"),
+    ("GET", "/admin/profiling/profiles"),
+    ("DELETE", "/admin/profiling/profiles"),
+    ("GET", "/admin/profiling/profiles/aggregate"),
+    ("POST", "/admin/profiling/memory/start"),
+    ("POST", "/admin/profiling/memory/snapshots"),
+    ("GET", "/admin/profiling/memory/snapshots/missing"),
+]
+
+
+@pytest.mark.parametrize("method,path", ADMIN_ENDPOINTS)
+def test_admin_endpoints_are_hidden_without_admin_token(client, monkeypatch, method, path):
+    """Test 4: With ADMIN_TOKEN unset every admin endpoint answers 404, even to a bearer token."""
+    monkeypatch.setattr("src.app.settings.ADMIN_TOKEN", None)
+    assert client.open(path, method=method).status_code == 404
+    assert client.open(path, method=method, headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("method,path", ADMIN_ENDPOINTS)
+def test_admin_endpoints_reject_missing_or_wrong_token(client, monkeypatch, method, path):
+    """Test 5: A missing, wrong or malformed Authorization header gets a 401."""
+    monkeypatch.setattr("src.app.settings.ADMIN_TOKEN", "s3cret")
+    for headers in ({}, {"Authorization": "Bearer wrong"}, {"Authorization": "s3cret"},
+                    {"Authorization": "Bearer s3cret2"}):
+        response = client.open(path, method=method, headers=headers)
+        assert response.status_code == 401
+        assert response.get_json() == {"error": "Admin token required."}
+
+
+def test_admin_endpoint_accepts_the_admin_token(client, monkeypatch):
+    """Test 6: The right bearer token reaches the view."""
+    monkeypatch.setattr("src.app.settings.ADMIN_TOKEN", "s3cret")
+    response = client.get("/admin/profiling", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "enabled" in response.get_json()["requests"]
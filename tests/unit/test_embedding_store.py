@@ -0,0 +1,122 @@
+# test_embedding_store.py
+"""
+Tests for the persistent, content-addressed embedding store.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.data_pipeline.embedding_store import EmbeddingStore, _catalog_texts
+
+
+class CountingEncoder:
+    """Encodes a text as a constant vector of its length and records calls."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.stack([np.full(8, len(text), dtype="float32") for text in texts])
+
+
+def test_only_unseen_texts_are_encoded(tmp_path):
+    """Test 1: Texts already in the store (even from a previous process) are not re-encoded."""
+    encoder = CountingEncoder()
+    store = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    first = store.get_or_encode(["shampoo", "gel", "shampoo"], encoder)
+
+    assert first[:, 0].tolist() == [7.0, 3.0, 7.0]
+    assert encoder.encoded == ["shampoo", "gel"]
+
+    reopened = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    second = reopened.get_or_encode(["gel", "hair mask"], encoder)
+
+    assert second[:, 0].tolist() == [3.0, 9.0]
+    assert encoder.encoded == ["shampoo", "gel", "hair mask"]
+
+
+def test_vectors_are_kept_per_model(tmp_path):
+    """Test 2: The same text embedded by another model is a different entry."""
+    encoder = CountingEncoder()
+    EmbeddingStore(model_name="model-a", store_path=str(tmp_path)).get_or_encode(["gel"], encoder)
+    EmbeddingStore(model_name="model-b", store_path=str(tmp_path)).get_or_encode(["gel"], encoder)
+
+    assert encoder.encoded == ["gel", "gel"]
+
+
+def test_gc_drops_unreferenced_rows(tmp_path):
+    """Test 3: GC compacts the store and surviving vectors stay correct after reopening."""
+    encoder = CountingEncoder()
+    store = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    store.get_or_encode(["shampoo", "gel", "hair mask"], encoder)
+
+    assert store.gc(["hair mask", "shampoo"]) == 1
+    assert store.stats()["rows"] == 2
+    assert store.stats()["vectors_bytes"] == 2 * 8 * 4
+
+    reopened = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    vectors = reopened.get_or_encode(["hair mask", "shampoo"], encoder)
+    assert vectors[:, 0].tolist() == [9.0, 7.0]
+    assert encoder.encoded == ["shampoo", "gel", "hair mask"]
+
+
+def test_gc_keeps_tenant_catalog_texts(tmp_path, monkeypatch):
+    """Test 4: GC of the shared store keeps the vectors of every tenant's products."""
+    def write_products(path, descriptions):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps([{"id": str(i), "description": d} for i, d in enumerate(descriptions)]))
+
+    write_products(tmp_path / "products.json", ["shampoo"])
+    write_products(tmp_path / "tenants" / "acme" / "products.json", ["anvil"])
+    write_products(tmp_path / "tenants" / "globex" / "products.json", ["hair mask"])
+    monkeypatch.setattr("src.data_pipeline.embedding_store.settings.PRODUCTS_DATA_PATH", str(tmp_path / "products.json"))
+    monkeypatch.setattr("src.data_pipeline.embedding_store.settings.TENANT_DATA_DIR", str(tmp_path / "tenants"))
+
+    store = EmbeddingStore(model_name="test-model", store_path=str(tmp_path / "store"))
+    store.get_or_encode(["shampoo", "anvil", "hair mask", "discontinued gel"], CountingEncoder())
+
+    assert sorted(_catalog_texts()) == ["anvil", "hair mask", "shampoo"]
+    assert store.gc(_catalog_texts()) == 1
+    assert store.stats()["rows"] == 3
+
+
+def test_two_stores_appending_to_the_same_path(tmp_path):
+    """Test 5: Writers sharing a directory see each other's rows and never overwrite them."""
+    encoder = CountingEncoder()
+    first = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    second = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+
+    first.get_or_encode(["shampoo", "gel"], encoder)
+    second.get_or_encode(["hair mask", "shampoo"], encoder)
+    assert encoder.encoded == ["shampoo", "gel", "hair mask"]
+
+    # Many concurrent batches from both instances, each only serialized by the file lock
+    texts = [f"product {'x' * i}" for i in range(1, 41)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: (first, second)[i % 2].get_or_encode(texts[i::8], encoder), range(8)))
+
+    reopened = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    assert reopened.stats()["rows"] == 3 + len(texts)
+    everything = ["shampoo", "gel", "hair mask"] + texts
+    vectors = reopened.get_or_encode(everything, encoder)
+    assert vectors[:, 0].tolist() == [float(len(text)) for text in everything]
+    assert sorted(encoder.encoded) == sorted(everything)
+
+
+def test_stores_from_the_row_mapping_format_are_migrated(tmp_path):
+    """Test 6: A store whose index.json still maps hashes to rows is read and converted."""
+    model_dir = tmp_path / "test-model"
+    model_dir.mkdir()
+    np.asarray([[3.0] * 8, [7.0] * 8], dtype="float32").tofile(model_dir / "vectors-0.f32")
+    (model_dir / "index.json").write_text(json.dumps({
+        "model_name": "test-model", "dimension": 8, "generation": 0,
+        "rows": {EmbeddingStore.text_hash("shampoo"): 1, EmbeddingStore.text_hash("gel"): 0},
+    }))
+
+    encoder = CountingEncoder()
+    store = EmbeddingStore(model_name="test-model", store_path=str(tmp_path))
+    assert store.get_or_encode(["shampoo", "gel"], encoder)[:, 0].tolist() == [7.0, 3.0]
+    assert encoder.encoded == []
+    assert "rows" not in json.loads((model_dir / "index.json").read_text())
@@ -0,0 +1,85 @@
+# test_fake_gemini.py
+"""
+Tests for the load-test Gemini stand-in: the retrieval tool is called on the
+first turn of a conversation and a final answer is given once it has run.
+Also checks that the load driver refuses to run against the real API.
+"""
+import json
+
+import pytest
+
+from loadtest import driver, fake_gemini
+
+# Abridged CrewAI system prompt; it explains the ReAct format, "Observation:" included
+SYSTEM_PROMPT = (
+    "You ONLY have access to the following tools: Semantic Product Retriever\n"
+    "Thought: you should always think about what to do\n"
+    "Action: the action to take, only one name of [Semantic Product Retriever]\n"
+    "Action Input: the input to the action\n"
+    "Observation: the result of the action"
+)
+TASK = "Given the user's query: 'gel for curly hair', retrieve the most relevant products."
+
+
+def _generate(contents):
+    body = {"system_instruction": {"parts": [{"text": SYSTEM_PROMPT}]}, "contents": contents}
+    client = fake_gemini.app.test_client()
+    response = client.post("/v1beta/models/gemini-2.0-flash-exp:generateContent", json=body)
+    assert response.status_code == 200
+    return response.get_json()["candidates"][0]["content"]["parts"][0]["text"]
+
+
+def test_first_turn_calls_the_retrieval_tool():
+    """Test 1: A new conversation gets an Action for the retrieval tool with the user's query."""
+    reply = _generate([{"role": "user", "parts": [{"text": TASK}]}])
+
+    assert "Final Answer" not in reply
+    assert f"Action: {fake_gemini.RETRIEVAL_TOOL_NAME}" in reply
+    assert json.loads(reply.split("Action Input:", 1)[1]) == {"query": "gel for curly hair"}
+
+
+def test_turn_after_the_tool_ran_gives_the_final_answer():
+    """Test 2: Once the tool call and its observation are in the conversation, the reply is final."""
+    tool_call = _generate([{"role": "user", "parts": [{"text": TASK}]}])
+    reply = _generate([
+        {"role": "user", "parts": [{"text": TASK}]},
+        {"role": "model", "parts": [{"text": tool_call}]},
+        {"role": "user", "parts": [{"text": "Observation: [{'id': '4', 'title': 'Zubale Styling Gel'}]"}]},
+    ])
+    assert reply.startswith("Thought: I now know the final answer\nFinal Answer:")
+
+    # Observation sent back in a user turn only
+    reply = _generate([
+        {"role": "user", "parts": [{"text": TASK}]},
+        {"role": "user", "parts": [{"text": "Observation: []"}]},
+    ])
+    assert "Final Answer:" in reply
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def test_driver_refuses_apps_not_using_the_fake_server(monkeypatch):
+    """Test 3: The driver only runs when the app's LLM endpoint is the fake Gemini server."""
+    fake_health = fake_gemini.app.test_client().get("/health").get_json()
+    health = {
+        "http://bot:5000/health": {"status": "healthy", "llm_api_base": None},
+        "http://fake-gemini:8080/health": fake_health,
+        "http://proxy:8080/health": {"status": "healthy"},
+    }
+    monkeypatch.setattr(driver.requests, "get", lambda url, timeout: FakeResponse(health[url]))
+
+    with pytest.raises(SystemExit, match="real Gemini API"):
+        driver.require_fake_llm("http://bot:5000")
+
+    health["http://bot:5000/health"]["llm_api_base"] = "http://proxy:8080/v1beta/models/gemini-2.0-flash-exp"
+    with pytest.raises(SystemExit, match="not the fake Gemini server"):
+        driver.require_fake_llm("http://bot:5000")
+
+    health["http://bot:5000/health"]["llm_api_base"] = "http://fake-gemini:8080/v1beta/models/gemini-2.0-flash-exp"
+    driver.require_fake_llm("http://bot:5000")
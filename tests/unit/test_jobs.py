@@ -0,0 +1,91 @@
+# test_jobs.py
+"""
+Tests for the asynchronous job queue, run against both backends with a fake
+handler instead of the crew.
+"""
+import time
+
+import pytest
+
+from src.services.jobs import (
+    InMemoryJobBackend,
+    JobManager,
+    JobQueueFull,
+    SQLiteJobBackend,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+)
+
+
+def fake_handler(payload):
+    if payload["query"] == "boom":
+        raise RuntimeError("crew exploded")
+    return {"response": f"answer to {payload['query']}", "tier": "llm"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def factory(max_depth=10, result_ttl_s=60):
+        if request.param == "memory":
+            return InMemoryJobBackend(max_depth, result_ttl_s)
+        return SQLiteJobBackend(str(tmp_path / "jobs.sqlite3"), max_depth, result_ttl_s)
+    return factory
+
+
+def test_jobs_run_in_background_and_long_poll(make_backend):
+    """Test 1: Submitted jobs are processed by workers; wait() returns the result."""
+    manager = JobManager(make_backend(), handler=fake_handler, workers=2)
+    manager.start()
+    try:
+        ok = manager.submit({"user_id": "u1", "query": "shampoo"})
+        bad = manager.submit({"user_id": "u1", "query": "boom"})
+        assert ok.status == STATUS_QUEUED
+
+        done = manager.backend.wait(ok.id, timeout=5)
+        failed = manager.backend.wait(bad.id, timeout=5)
+    finally:
+        manager.stop()
+
+    assert done.status == STATUS_SUCCEEDED
+    assert done.result == {"response": "answer to shampoo", "tier": "llm"}
+    assert failed.status == STATUS_FAILED
+    assert "crew exploded" in failed.error
+
+
+def test_queue_depth_is_bounded(make_backend):
+    """Test 2: Submitting beyond the maximum depth is rejected."""
+    backend = make_backend(max_depth=2)
+    backend.submit({"user_id": "u1", "query": "a"})
+    backend.submit({"user_id": "u1", "query": "b"})
+    with pytest.raises(JobQueueFull):
+        backend.submit({"user_id": "u1", "query": "c"})
+    assert backend.depth() == 2
+
+
+def test_results_expire_after_ttl(make_backend):
+    """Test 3: Finished jobs disappear once their TTL passes."""
+    backend = make_backend(result_ttl_s=0.1)
+    job = backend.submit({"user_id": "u1", "query": "a"})
+    backend.claim(timeout=1)
+    backend.finish(job.id, STATUS_SUCCEEDED, result={"response": "x"})
+    assert backend.get(job.id).status == STATUS_SUCCEEDED
+
+    time.sleep(0.15)
+    assert backend.get(job.id) is None
+    assert backend.purge_expired() == 1
+
+
+def test_sqlite_backend_survives_restart(tmp_path):
+    """Test 4: Queued and interrupted jobs are still there after a restart."""
+    path = str(tmp_path / "jobs.sqlite3")
+    backend = SQLiteJobBackend(path, max_depth=10, result_ttl_s=60)
+    interrupted = backend.submit({"user_id": "u1", "query": "a"})
+    waiting = backend.submit({"user_id": "u1", "query": "b"})
+    assert backend.claim(timeout=1).status == STATUS_RUNNING
+
+    restarted = SQLiteJobBackend(path, max_depth=10, result_ttl_s=60)
+    assert restarted.get(interrupted.id).status == STATUS_QUEUED
+    assert restarted.get(waiting.id).payload == {"user_id": "u1", "query": "b"}
+    assert restarted.depth() == 2
@@ -0,0 +1,181 @@
+# test_llm_resilience.py
+"""
+Tests for LLM call resilience: deadlines, hedging, retries and the circuit
+breaker. The upstream is simulated with plain Python callables, also beneath
+crewai's LLM in place of litellm's completion function.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.llm_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    ResilientCaller,
+    current_deadline,
+    request_deadline,
+)
+
+
+def _caller(**overrides):
+    options = dict(hedge_enabled=False, hedge_min_delay_s=0.05, max_retries=0, backoff_base_s=0.001,
+                   backoff_max_s=0.001, breaker=CircuitBreaker(failure_threshold=3, reset_timeout_s=0.1))
+    options.update(overrides)
+    return ResilientCaller(**options)
+
+
+def test_hedged_request_wins_over_slow_primary():
+    """Test 1: A duplicate sent after the hedge delay answers first."""
+    calls = []
+    lock = threading.Lock()
+
+    def upstream():
+        with lock:
+            calls.append(time.monotonic())
+            first = len(calls) == 1
+        time.sleep(1.0 if first else 0.01)
+        return "slow" if first else "fast"
+
+    caller = _caller(hedge_enabled=True)
+    start = time.monotonic()
+    assert caller.call(upstream) == "fast"
+    assert time.monotonic() - start < 0.5
+    assert caller.stats["hedges"] == 1
+
+
+def test_deadline_propagates_and_is_enforced():
+    """Test 2: The deadline is visible inside the call and cuts off slow upstreams."""
+    seen = []
+
+    def upstream():
+        seen.append(current_deadline())
+        time.sleep(1.0)
+
+    caller = _caller()
+    with request_deadline(0.1) as deadline:
+        with pytest.raises(DeadlineExceeded):
+            caller.call(upstream)
+    assert seen == [deadline]
+
+
+def test_transient_errors_are_retried():
+    """Test 3: Transient failures are retried; the next success is returned."""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("upstream reset")
+        return "ok"
+
+    caller = _caller(max_retries=2)
+    assert caller.call(flaky) == "ok"
+    assert caller.stats["retries"] == 2
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    """Test 4: Repeated failures open the circuit; a successful probe closes it."""
+    caller = _caller()
+
+    def broken():
+        raise ConnectionError("down")
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            caller.call(broken)
+    assert caller.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        caller.call(lambda: "not called")
+
+    time.sleep(0.15)
+    assert caller.call(lambda: "ok") == "ok"
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_deadline_spent_queued_is_not_an_upstream_failure():
+    """Test 5: Calls that time out waiting for a free worker don't open the circuit."""
+    caller = _caller(max_workers=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout_s=10))
+    release = threading.Event()
+    caller.executor.submit(release.wait)  # occupies the only worker
+
+    try:
+        for _ in range(3):
+            with request_deadline(0.05):
+                with pytest.raises(DeadlineExceeded):
+                    caller.call(lambda: "not sent")
+        assert caller.breaker.state == CircuitBreaker.CLOSED
+        assert caller.stats["deadline_before_send"] == 3
+    finally:
+        release.set()
+
+    # A call that reached the upstream and timed out still counts
+    with request_deadline(0.05):
+        with pytest.raises(DeadlineExceeded):
+            caller.call(time.sleep, 0.5)
+    assert caller.breaker.state == CircuitBreaker.OPEN
+
+
+def _completion_response(content):
+    """The parts of a litellm ModelResponse crewai reads."""
+    message = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def llm_service():
+    pytest.importorskip("crewai")
+    from src.services import llm_service
+    return llm_service
+
+
+def test_resilient_llm_hedges_the_completion_request_only(llm_service, monkeypatch):
+    """Test 6: crewai's LLM.call runs once while the completion request underneath is hedged."""
+    from crewai import LLM
+
+    requests, llm_calls = [], []
+    lock = threading.Lock()
+
+    def upstream(**params):
+        with lock:
+            requests.append(params)
+            first = len(requests) == 1
+        time.sleep(1.0 if first else 0.01)
+        return _completion_response("slow" if first else "fast")
+
+    crewai_call = LLM.call
+    monkeypatch.setattr(LLM, "call", lambda self, *a, **kw: llm_calls.append(1) or crewai_call(self, *a, **kw))
+    monkeypatch.setattr(llm_service, "_litellm_completion", upstream)
+    caller = _caller(hedge_enabled=True)
+    llm = llm_service.ResilientLLM(model="gemini/gemini-2.0-flash", api_key="test", caller=caller)
+
+    assert llm.call("shampoo for curly hair?") == "fast"
+    assert len(requests) == 2 and caller.stats["hedges"] == 1
+    assert llm_calls == [1]
+
+
+def test_resilient_llm_caps_the_completion_timeout_at_the_deadline(llm_service, monkeypatch):
+    """Test 7: The request deadline caps the timeout litellm gets; a shorter constructor timeout wins."""
+    seen = []
+    upstream = lambda **params: seen.append(params["timeout"]) or _completion_response("ok")
+    monkeypatch.setattr(llm_service, "_litellm_completion", upstream)
+
+    with request_deadline(5.0):
+        llm_service.ResilientLLM(model="gemini/gemini-2.0-flash", api_key="test", caller=_caller()).call("gel?")
+        llm_service.ResilientLLM(model="gemini/gemini-2.0-flash", api_key="test", timeout=0.5,
+                                 caller=_caller()).call("gel?")
+    assert 4.0 < seen[0] <= 5.0
+    assert seen[1] == 0.5
+
+
+def test_completion_outside_resilient_llm_is_untouched(llm_service, monkeypatch):
+    """Test 8: Other litellm users get the plain completion: no caller, no timeout added."""
+    import litellm
+
+    seen = []
+    monkeypatch.setattr(llm_service, "_litellm_completion", lambda **params: seen.append(params) or "plain")
+    with request_deadline(5.0):
+        assert litellm.completion(model="gemini/gemini-2.0-flash", messages=[]) == "plain"
+    assert seen == [{"model": "gemini/gemini-2.0-flash", "messages": []}]
@@ -0,0 +1,119 @@
+# test_profiling.py
+"""
+Tests for on-demand profiling: request sampling, spans, the pstats and
+collapsed-stack exports and tracemalloc snapshot diffs.
+"""
+import marshal
+import threading
+import time
+
+import pytest
+
+from src.services.profiling import (
+    MemoryProfiler,
+    RequestProfiler,
+    dump_collapsed,
+    dump_pstats,
+    dump_text,
+    profile_span,
+)
+
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def handle_request(profiler):
+    with profiler.profile_request("answer_query") as record:
+        with profile_span("encode"):
+            busy_work(0.05)
+        with profile_span("faiss_search"):
+            busy_work(0.01)
+    return record
+
+
+def test_disabled_or_unsampled_requests_are_not_profiled():
+    """Test 1: Nothing is recorded when profiling is off or the sample rate is 0."""
+    off = RequestProfiler(enabled=False, sample_rate=1.0)
+    never = RequestProfiler(enabled=True, sample_rate=0.0)
+    assert handle_request(off) is None and handle_request(never) is None
+    assert off.profiles() == [] and never.profiles() == []
+
+    # Spans outside a sampled request are no-ops
+    with profile_span("encode"):
+        pass
+
+
+def test_sampled_request_records_spans_stats_and_stacks():
+    """Test 2: A sampled request has stage timings, cProfile stats and sampled stacks."""
+    profiler = RequestProfiler(enabled=True, sample_rate=1.0, stack_interval_s=0.002)
+    record = handle_request(profiler)
+
+    assert profiler.profiles() == [record]
+    assert record.spans["encode"] >= 0.05 and record.span_calls["faiss_search"] == 1
+    assert any(func[2] == "busy_work" for func in record.stats.stats)
+    assert "busy_work" in dump_text(record)
+
+    collapsed = dump_collapsed(record).splitlines()
+    assert collapsed and all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+    assert any("handle_request" in line and "busy_work" in line for line in collapsed)
+    assert marshal.loads(dump_pstats(record)) == record.stats.stats
+
+
+def test_only_one_request_is_profiled_at_a_time():
+    """Test 3: Requests sampled while another is being profiled are skipped."""
+    profiler = RequestProfiler(enabled=True, sample_rate=1.0)
+    threads = [threading.Thread(target=handle_request, args=(profiler,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(profiler.profiles()) + profiler.skipped_busy == 4
+    aggregate = RequestProfiler.merge(profiler.profiles())
+    assert aggregate.span_calls["encode"] == len(profiler.profiles())
+
+
+def test_runtime_toggle_validates_sample_rate():
+    """Test 4: Profiling can be switched at runtime; invalid rates are rejected."""
+    profiler = RequestProfiler(enabled=False, sample_rate=0.01)
+    status = profiler.configure(enabled=True, sample_rate=0.5)
+    assert status["enabled"] and status["sample_rate"] == 0.5
+    with pytest.raises(ValueError):
+        profiler.configure(sample_rate=2)
+    assert profiler.sample_rate == 0.5
+
+
+def test_memory_snapshot_diff_shows_growth():
+    """Test 5: A diff between snapshots points at the line that allocated."""
+    profiler = MemoryProfiler()
+    profiler.start()
+    try:
+        before = profiler.snapshot()
+        cache = [bytes(1000) for _ in range(2000)]  # ~2 MB of growth
+        diff = profiler.diff(before, include=__file__)
+    finally:
+        profiler.stop()
+
+    assert diff[0]["size_diff_bytes"] >= 2_000_000
+    assert "test_profiling.py" in diff[0]["location"][0]
+    assert len(cache) == 2000
+
+
+def test_request_runs_unprofiled_when_another_profiler_is_active(monkeypatch):
+    """Test 6: If cProfile cannot be enabled the request still completes, just without a profile."""
+    class ConflictingProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    profiler = RequestProfiler(enabled=True, sample_rate=1.0)
+    with monkeypatch.context() as mp:
+        mp.setattr("src.services.profiling.cProfile.Profile", ConflictingProfile)
+        assert handle_request(profiler) is None
+    assert profiler.profiles() == [] and profiler.skipped_busy == 1
+
+    # The profiling slot was released: the next request is profiled again
+    assert handle_request(profiler) is not None
+    assert len(profiler.profiles()) == 1
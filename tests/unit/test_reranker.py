@@ -0,0 +1,110 @@
+# test_reranker.py
+"""
+Tests for the cross-encoder rerank stage, using a fake cross-encoder so no
+model has to be downloaded.
+"""
+import time
+
+from src.data_pipeline.reranker import CrossEncoderReranker
+from src.data_pipeline.retriever import RetrievedDocument
+
+
+class WordOverlapCrossEncoder:
+    """Scores a (query, text) pair by the number of shared words."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.pairs_scored = 0
+
+    def predict(self, pairs, **kwargs):
+        time.sleep(self.delay)
+        self.pairs_scored += len(pairs)
+        return [len(set(q.lower().split()) & set(text.lower().split())) for q, text in pairs]
+
+
+def _candidates():
+    docs = [
+        {"id": "1", "description": "natural shampoo with aloe"},
+        {"id": "2", "description": "conditioner for smooth hair"},
+        {"id": "3", "description": "deep treatment mask for dry damaged hair"},
+    ]
+    return [RetrievedDocument(document=doc, score=float(i), rank=i) for i, doc in enumerate(docs)]
+
+
+def test_rerank_reorders_by_cross_encoder_score():
+    """Test 1: The best cross-encoder match moves to the top."""
+    reranker = CrossEncoderReranker(model=WordOverlapCrossEncoder(), batch_size=2)
+    results = reranker.rerank("mask for dry damaged hair", _candidates(), top_k=2, budget_ms=1000)
+
+    assert [doc["id"] for doc in results] == ["3", "2"]
+    assert [doc.rank for doc in results] == [0, 1]
+    assert results[0]["_rerank_score"] == 5.0
+    assert results[0]["_score"] == 2.0  # first-stage distance is kept
+
+
+def test_rerank_scores_are_cached_per_query_and_document():
+    """Test 2: Repeating a query does not call the cross-encoder again."""
+    model = WordOverlapCrossEncoder()
+    reranker = CrossEncoderReranker(model=model, batch_size=2)
+    model.pairs_scored = 0  # ignore the warm-up batches
+
+    reranker.rerank("dry hair", _candidates(), top_k=2, budget_ms=1000)
+    assert model.pairs_scored == 3
+    reranker.rerank("dry hair", _candidates(), top_k=2, budget_ms=1000)
+    assert model.pairs_scored == 3
+    reranker.rerank("aloe shampoo", _candidates(), top_k=2, budget_ms=1000)
+    assert model.pairs_scored == 6
+
+
+def test_model_slower_than_budget_keeps_first_stage_order_within_budget():
+    """Test 3: When a batch costs more than the budget, nothing is scored and the request stays within budget."""
+    model = WordOverlapCrossEncoder(delay=0.05)
+    reranker = CrossEncoderReranker(model=model, batch_size=1, probe_interval_s=60)
+    pairs_after_warm_up = model.pairs_scored
+
+    start = time.perf_counter()
+    results = reranker.rerank("mask for dry damaged hair", _candidates(), top_k=2, budget_ms=30)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    assert elapsed_ms < 30
+    assert [doc["id"] for doc in results] == ["1", "2"]
+    assert all(doc.rerank_score is None for doc in results)
+    assert model.pairs_scored == pairs_after_warm_up
+
+
+def test_partial_budget_reranks_the_scored_head():
+    """Test 4: Batches that fit are scored and ranked; the unscored tail keeps first-stage order."""
+    model = WordOverlapCrossEncoder(delay=0.03)
+    reranker = CrossEncoderReranker(model=model, batch_size=1)
+
+    start = time.perf_counter()
+    results = reranker.rerank("conditioner for smooth hair", _candidates(), top_k=3, budget_ms=75)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    assert elapsed_ms < 75
+    assert [doc["id"] for doc in results] == ["2", "1", "3"]
+    assert results[0].rerank_score == 4.0 and results[1].rerank_score == 0.0
+    assert results[2].rerank_score is None
+
+
+def test_rerank_resumes_after_model_recovers():
+    """Test 5: After a slow spell the estimate follows measurements only, and reranking comes back."""
+    model = WordOverlapCrossEncoder()
+    reranker = CrossEncoderReranker(model=model, batch_size=3, probe_interval_s=0)
+
+    model.delay = 0.2  # e.g. a noisy neighbour
+    reranker.rerank("dry hair", _candidates(), top_k=2, budget_ms=50)
+    for attempt in range(3):
+        start = time.perf_counter()
+        results = reranker.rerank(f"dry hair {attempt}", _candidates(), top_k=2, budget_ms=50)
+        assert (time.perf_counter() - start) * 1000 < 50
+        assert results[0].rerank_score is None
+        reranker._probe_thread.join()
+
+    model.delay = 0.0
+    for attempt in range(20):
+        results = reranker.rerank(f"mask for dry damaged hair {attempt}", _candidates(), top_k=2, budget_ms=50)
+        if results[0].rerank_score is not None:
+            break
+        reranker._probe_thread.join()
+    assert results[0]["id"] == "3" and results[0].rerank_score is not None
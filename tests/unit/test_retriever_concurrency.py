@@ -0,0 +1,152 @@
+# test_retriever_concurrency.py
+"""
+Stress test for ProductRetriever under concurrent load, and the FAISS/torch
+thread pool sizing. Uses a small synthetic catalog and a deterministic hashing
+encoder so it runs without downloading the embedding model (the torch checks
+are skipped when torch is not installed).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import FrozenInstanceError
+
+import faiss
+import numpy as np
+import pytest
+
+from src.config import settings
+from src.data_pipeline.retriever import ProductRetriever
+from src.data_pipeline.thread_pools import configure_thread_pools
+
+DIMENSION = 64
+CATALOG_SIZE = 2000
+QUERY_COUNT = 400
+TOP_K = 5
+CONCURRENCY_LEVELS = [1, 2, 4, 8]
+
+
+class HashingEncoder:
+    """Deterministic stand-in for SentenceTransformer.encode."""
+
+    def encode(self, sentences, **kwargs):
+        vectors = []
+        for sentence in sentences:
+            seed = int.from_bytes(hashlib.sha1(sentence.encode("utf-8")).digest()[:8], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(DIMENSION))
+        return np.asarray(vectors, dtype="float32")
+
+
+@pytest.fixture(scope="module")
+def retriever(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("catalog")
+    encoder = HashingEncoder()
+    documents = [
+        {"id": str(i), "title": f"Product {i}", "description": f"Synthetic product number {i}"}
+        for i in range(CATALOG_SIZE)
+    ]
+    index = faiss.IndexFlatL2(DIMENSION)
+    index.add(encoder.encode([doc["description"] for doc in documents]))
+
+    docs_path = data_dir / "docs.json"
+    index_path = data_dir / "faiss.index"
+    docs_path.write_text(json.dumps(documents), encoding="utf-8")
+    faiss.write_index(index, str(index_path))
+
+    return ProductRetriever(model=encoder, docs_data_path=str(docs_path), faiss_index_path=str(index_path))
+
+
+def _queries():
+    return [f"query about product {i % 250} variant {i}" for i in range(QUERY_COUNT)]
+
+
+def _signature(results):
+    return [(doc["id"], doc["_score"]) for doc in results]
+
+
+def test_results_are_per_request_and_read_only(retriever):
+    """Test 1: Results carry their own score and cannot mutate the catalog."""
+    first = retriever.get_relevant_context("shampoo", top_k=TOP_K)
+    second = retriever.get_relevant_context("hair mask", top_k=TOP_K)
+
+    assert [doc.rank for doc in first] == list(range(TOP_K))
+    assert first[0]["_score"] == first[0].score
+    assert dict(first[0]) == first[0].to_dict()
+
+    with pytest.raises(TypeError):
+        first[0]["_score"] = 0.0
+    with pytest.raises(FrozenInstanceError):
+        first[0].score = 0.0
+    with pytest.raises(TypeError):
+        retriever.documents[0]["_score"] = 0.0
+
+    # Scores from the second request did not leak into the first
+    assert _signature(first) == _signature(retriever.get_relevant_context("shampoo", top_k=TOP_K))
+    assert all("_score" not in doc for doc in retriever.documents)
+    assert second  # sanity
+
+
+def test_concurrent_results_match_sequential(retriever):
+    """Test 2: Concurrent results are identical to sequential ones."""
+    queries = _queries()
+    expected = [_signature(retriever.get_relevant_context(q, top_k=TOP_K)) for q in queries]
+
+    for workers in CONCURRENCY_LEVELS:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda q: retriever.get_relevant_context(q, top_k=TOP_K), queries))
+        assert [_signature(r) for r in results] == expected, f"Mismatched results at concurrency {workers}"
+
+    assert all("_score" not in doc for doc in retriever.documents)
+
+
+def test_configure_thread_pools_sizes_faiss_and_torch():
+    """Test 3: Both libraries use the configured thread counts; the torch default is a share of the cores."""
+    torch = pytest.importorskip("torch")
+    previous = (faiss.omp_get_max_threads(), torch.get_num_threads())
+    try:
+        assert configure_thread_pools(faiss_threads=2, torch_threads=3) == {"faiss_threads": 2, "torch_threads": 3}
+        assert faiss.omp_get_max_threads() == 2 and torch.get_num_threads() == 3
+
+        configure_thread_pools()
+        assert faiss.omp_get_max_threads() == settings.FAISS_OMP_THREADS
+        assert torch.get_num_threads() == settings.TORCH_NUM_THREADS
+        assert 1 <= settings.TORCH_NUM_THREADS <= max(1, (os.cpu_count() or 1) // settings.QUERY_WORKERS)
+    finally:
+        faiss.omp_set_num_threads(previous[0])
+        torch.set_num_threads(previous[1])
+
+
+def test_only_tokenization_is_serialized(retriever):
+    """Test 4: Forward passes of concurrent queries overlap; only the tokenizer call is locked."""
+    torch = pytest.importorskip("torch")
+
+    class SlowSentenceTransformer:
+        device = "cpu"
+
+        def __init__(self):
+            self.active = 0
+            self.max_active = 0
+            self.lock = threading.Lock()
+
+        def tokenize(self, texts):
+            return {"input_ids": torch.ones((len(texts), 4), dtype=torch.long)}
+
+        def __call__(self, features):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05)
+            with self.lock:
+                self.active -= 1
+            return {"sentence_embedding": torch.ones((len(features["input_ids"]), DIMENSION))}
+
+    model = SlowSentenceTransformer()
+    shared = ProductRetriever(model=model, docs_data_path=retriever.docs_data_path,
+                              faiss_index_path=retriever.faiss_index_path)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda q: shared.get_relevant_context(q, top_k=TOP_K), _queries()[:8]))
+
+    assert all(len(r) == TOP_K for r in results)
+    assert model.max_active > 1
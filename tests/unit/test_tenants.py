@@ -0,0 +1,117 @@
+# test_tenants.py
+"""
+Tests for the multi-tenant catalog registry: lazy loading, single-flight
+loads, LRU eviction under the memory budget and the per-tenant metrics.
+Catalogs come from a fake loader instead of FAISS indexes on disk.
+"""
+import runpy
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.services.tenants import (
+    DEFAULT_TENANT,
+    TenantCatalog,
+    TenantRegistry,
+    UnknownTenantError,
+    current_catalog,
+    tenant_scope,
+)
+
+
+class FakeLoader:
+    """Builds catalogs of a fixed size, slowly, and counts the loads per tenant."""
+
+    def __init__(self, memory_bytes=100, delay_s=0.0, known=("acme", "globex", "initech")):
+        self.memory_bytes = memory_bytes
+        self.delay_s = delay_s
+        self.known = known
+        self.loads = []
+        self.lock = threading.Lock()
+
+    def __call__(self, tenant_id):
+        with self.lock:
+            self.loads.append(tenant_id)
+        time.sleep(self.delay_s)
+        if tenant_id not in self.known:
+            raise UnknownTenantError(f"No indexed catalog for tenant '{tenant_id}'.")
+        return TenantCatalog(tenant_id=tenant_id, retriever=object(), answer_policy=None,
+                             memory_bytes=self.memory_bytes)
+
+
+def test_catalogs_load_lazily_and_are_cached():
+    """Test 1: A tenant is loaded on first use only; later lookups are hits."""
+    loader = FakeLoader()
+    registry = TenantRegistry(loader=loader, memory_budget_bytes=1000)
+    first = registry.get("acme")
+    assert registry.get("acme") is first
+    assert loader.loads == ["acme"]
+
+    stats = registry.metrics()["tenants"]["acme"]
+    assert stats["loaded"] and stats["loads"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+    assert stats["memory_bytes"] == 100
+
+
+def test_concurrent_first_requests_share_one_load():
+    """Test 2: Many simultaneous first requests for a tenant trigger a single load."""
+    loader = FakeLoader(delay_s=0.2)
+    registry = TenantRegistry(loader=loader, memory_budget_bytes=1000)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        catalogs = list(pool.map(registry.get, ["acme"] * 8))
+    assert loader.loads == ["acme"]
+    assert all(catalog is catalogs[0] for catalog in catalogs)
+
+
+def test_least_recently_used_tenant_is_evicted_over_budget():
+    """Test 3: Exceeding the memory budget evicts the least recently used catalog, never a pinned one."""
+    loader = FakeLoader(known=(DEFAULT_TENANT, "acme", "globex", "initech"))
+    registry = TenantRegistry(loader=loader, memory_budget_bytes=300, pinned=(DEFAULT_TENANT,))
+    pinned = registry.get(None)
+    registry.get("acme")
+    registry.get("globex")
+    registry.get("acme")  # globex is now the least recently used
+    registry.get("initech")
+
+    tenants = registry.metrics()["tenants"]
+    assert not tenants["globex"]["loaded"] and tenants["globex"]["evictions"] == 1
+    assert tenants["acme"]["loaded"] and tenants["initech"]["loaded"]
+    assert tenants[DEFAULT_TENANT]["loaded"] and tenants[DEFAULT_TENANT]["pinned"]
+    assert registry.get(None) is pinned and loader.loads.count(DEFAULT_TENANT) == 1
+    assert not registry.evict(DEFAULT_TENANT)
+    assert registry.memory_bytes() == 300
+
+
+def test_unknown_and_invalid_tenants_are_rejected():
+    """Test 4: Unknown tenants raise and are not kept in the metrics; path-like IDs are refused."""
+    loader = FakeLoader()
+    registry = TenantRegistry(loader=loader, memory_budget_bytes=1000)
+    with pytest.raises(UnknownTenantError):
+        registry.get("umbrella")
+    with pytest.raises(UnknownTenantError):
+        registry.get("../acme")
+    assert loader.loads == ["umbrella"]
+    assert registry.metrics()["tenants"] == {}
+
+
+def test_tenant_scope_sets_current_catalog():
+    """Test 5: The catalog is visible inside its scope only."""
+    catalog = TenantCatalog(tenant_id="acme", retriever=object(), answer_policy=None)
+    assert current_catalog() is None
+    with tenant_scope(catalog):
+        assert current_catalog() is catalog
+    assert current_catalog() is None
+
+
+def test_indexer_cli_refuses_path_like_tenant_ids(tmp_path, monkeypatch, capsys):
+    """Test 6: `indexer --tenant ../x` exits with a usage error before writing anything."""
+    monkeypatch.setattr("src.config.settings.TENANT_DATA_DIR", str(tmp_path / "tenants"))
+    monkeypatch.setattr(sys, "argv", ["indexer.py", "--tenant", "../x"])
+    with pytest.raises(SystemExit) as exited:
+        runpy.run_module("src.data_pipeline.indexer", run_name="__main__")
+    assert exited.value.code == 2
+    assert "invalid tenant ID '../x'" in capsys.readouterr().err
+    assert list(tmp_path.iterdir()) == []
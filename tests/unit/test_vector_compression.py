@@ -0,0 +1,140 @@
+# test_vector_compression.py
+"""
+Tests for the compressed FAISS index options: memory per vector, recall
+against exact search, shortlist re-ranking and loading a compressed index
+into ProductRetriever. Uses small synthetic catalogs.
+"""
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from src.data_pipeline.retriever import ProductRetriever
+from src.data_pipeline.vector_compression import (
+    build_index,
+    load_metadata,
+    metadata_path,
+    recall_at_k,
+    refine_search,
+    save_exact_vectors,
+)
+
+DIMENSION = 64
+TOP_K = 5
+
+
+def _vectors(n, seed=0):
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((8, DIMENSION))
+    return (rng.standard_normal((n, 8)) @ basis + 0.05 * rng.standard_normal((n, DIMENSION))).astype("float32")
+
+
+def _exact_ids(vectors, queries):
+    exact = faiss.IndexFlatL2(DIMENSION)
+    exact.add(vectors)
+    return exact.search(queries, TOP_K)[1]
+
+
+@pytest.mark.parametrize("compression, pca_dim, bytes_per_vector, min_recall", [
+    ("none", 0, 4 * DIMENSION, 1.0),
+    ("fp16", 0, 2 * DIMENSION, 0.95),
+    ("int8", 0, DIMENSION, 0.9),
+    ("none", 16, 4 * 16, 0.9),
+])
+def test_compression_options_trade_memory_for_recall(compression, pca_dim, bytes_per_vector, min_recall):
+    """Test 1: Each option encodes vectors in the expected size and keeps recall@k high."""
+    vectors, queries = _vectors(2000), _vectors(50, seed=1)
+    index, metadata = build_index(vectors, compression=compression, pca_dim=pca_dim)
+
+    assert metadata["bytes_per_vector"] == bytes_per_vector
+    assert metadata["ntotal"] == len(vectors)
+    assert recall_at_k(index.search(queries, TOP_K)[1], _exact_ids(vectors, queries), TOP_K) >= min_recall
+
+
+def test_pq_shortlist_reranking_restores_recall():
+    """Test 2: Re-ranking a PQ shortlist by exact distance recovers the exact neighbours."""
+    vectors, queries = _vectors(2000), _vectors(50, seed=1)
+    index, metadata = build_index(vectors, compression="pq", pca_dim=0, pq_m=8, pq_nbits=8)
+    exact_ids = _exact_ids(vectors, queries)
+
+    assert metadata["bytes_per_vector"] == 8
+    assert metadata["trained_on"] == len(vectors)
+    refined = np.vstack([refine_search(index, vectors, q.reshape(1, -1), TOP_K, 10)[1] for q in queries])
+    assert recall_at_k(refined, exact_ids, TOP_K) > recall_at_k(index.search(queries, TOP_K)[1], exact_ids, TOP_K)
+    assert recall_at_k(refined, exact_ids, TOP_K) >= 0.95
+
+
+def test_untrainable_options_are_rejected():
+    """Test 3: Too few training vectors or a bad PQ split fail with a readable error."""
+    with pytest.raises(ValueError, match="training vectors"):
+        build_index(_vectors(100), compression="pq", pca_dim=0, pq_m=8, pq_nbits=8)
+    with pytest.raises(ValueError, match="must divide"):
+        build_index(_vectors(2000), compression="pq", pca_dim=0, pq_m=7, pq_nbits=8)
+    with pytest.raises(ValueError, match="Unknown"):
+        build_index(_vectors(100), compression="zstd")
+
+
+def test_retriever_reranks_compressed_index_with_exact_vectors(tmp_path, monkeypatch):
+    """Test 4: A saved compressed index with exact vectors returns exact L2 distances."""
+    monkeypatch.setattr("src.data_pipeline.retriever.settings.FAISS_REFINE_FACTOR", 4)
+    vectors = _vectors(500)
+    documents = [{"id": str(i), "title": f"Product {i}", "description": f"Product {i}"} for i in range(len(vectors))]
+    index, metadata = build_index(vectors, compression="int8", pca_dim=0)
+    metadata["exact_vectors"] = True
+
+    index_path = str(tmp_path / "faiss.index")
+    faiss.write_index(index, index_path)
+    save_exact_vectors(vectors, index_path)
+    with open(metadata_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    (tmp_path / "docs.json").write_text(json.dumps(documents), encoding="utf-8")
+
+    class Encoder:
+        def encode(self, sentences, **kwargs):
+            return vectors[[int(s) for s in sentences]]
+
+    retriever = ProductRetriever(model=Encoder(), docs_data_path=str(tmp_path / "docs.json"), faiss_index_path=index_path)
+    results = retriever.get_relevant_context("42", top_k=TOP_K)
+
+    assert load_metadata(index_path)["factory"] == "SQ8"
+    assert results[0]["id"] == "42" and results[0].score == 0.0
+    expected = ((vectors[int(results[1]["id"])] - vectors[42]) ** 2).sum()
+    assert results[1].score == pytest.approx(expected, rel=1e-5)
+
+
+def test_rebuild_on_compression_change_reloads_shared_retriever(tmp_path, monkeypatch):
+    """Test 5: A retriever loaded before an automatic rebuild serves the rebuilt index."""
+    from src.data_pipeline import retriever as retriever_module
+    from src.data_pipeline.indexer import ProductIndexer
+
+    vectors = _vectors(200)
+    products = [{"id": str(i), "title": f"Product {i}", "description": str(i)} for i in range(len(vectors))]
+    (tmp_path / "products.json").write_text(json.dumps(products), encoding="utf-8")
+    paths = dict(products_data_path=str(tmp_path / "products.json"), docs_data_path=str(tmp_path / "docs.json"),
+                 faiss_index_path=str(tmp_path / "faiss.index"))
+
+    class Encoder:
+        def encode(self, sentences, **kwargs):
+            return vectors[[int(s) for s in sentences]]
+
+    def index_products():
+        indexer = ProductIndexer(**paths)
+        indexer._model = Encoder()
+        indexer.index_products()
+
+    monkeypatch.setattr("src.data_pipeline.indexer.settings.EMBEDDING_STORE_PATH", str(tmp_path / "embeddings"))
+    monkeypatch.setattr("src.data_pipeline.indexer.settings.FAISS_COMPRESSION", "none")
+    monkeypatch.setattr("src.data_pipeline.indexer.settings.FAISS_REFINE_FACTOR", 4)
+    index_products()
+    shared = ProductRetriever(model=Encoder(), docs_data_path=paths["docs_data_path"],
+                              faiss_index_path=paths["faiss_index_path"])
+    monkeypatch.setattr(retriever_module, "_product_retriever", shared)
+    assert shared.index_metadata["factory"] == "Flat" and shared.refine_factor == 0
+
+    monkeypatch.setattr("src.data_pipeline.indexer.settings.FAISS_COMPRESSION", "int8")
+    index_products()
+
+    assert shared.index_metadata["factory"] == "SQ8" and shared.refine_factor == 4
+    results = shared.get_relevant_context("7", top_k=TOP_K)
+    assert results[0]["id"] == "7" and results[0].score == 0.0